@@ -0,0 +1,12 @@
+# coding=utf-8
+"""
+Headless benchmarks of the reader and editor hot paths. Run them from the
+repository root with:
+    QT_QPA_PLATFORM=offscreen python -m benchmarks --output results.json
+and compare two runs with:
+    python -m benchmarks --compare before.json after.json
+The OpenGL reader benchmarks are skipped when no GL context can be
+created, which is the case of the offscreen platform without a display.
+Mesa software GL runs them without GPU, e.g.:
+    LIBGL_ALWAYS_SOFTWARE=1 xvfb-run python -m benchmarks
+"""
@@ -0,0 +1,97 @@
+# coding=utf-8
+import sys
+import json
+import platform
+import argparse
+from datetime import datetime
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog='benchmarks',
+        description='Hotbox designer reader and editor benchmarks.')
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=None,
+        help='shapes counts of the generated hotboxes')
+    parser.add_argument(
+        '--repeat', type=int, default=None,
+        help='runs per benchmark, the min and the median are reported')
+    parser.add_argument(
+        '--output', default=None,
+        help='json file to write, the results are printed if not set')
+    parser.add_argument(
+        '--compare', nargs=2, metavar=('BEFORE', 'AFTER'), default=None,
+        help='compare two results files instead of running the benchmarks')
+    return parser.parse_args(args)
+
+
+def get_environment():
+    from PySide2 import QtCore
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'date': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'qt': QtCore.qVersion(),
+        'numpy': numpy_version}
+
+
+def get_key(result):
+    return (
+        result['benchmark'], result['shapes'], result['images'],
+        result['aiming'])
+
+
+def compare(before_file, after_file):
+    with open(before_file, 'r') as f:
+        before = {get_key(r): r for r in json.load(f)['results']}
+    with open(after_file, 'r') as f:
+        after = json.load(f)['results']
+    line = '{:<24}{:>7}{:>8}{:>14}{:>14}{:>9}'
+    print(line.format('benchmark', 'shapes', 'images', 'before', 'after', 'ratio'))
+    for result in after:
+        reference = before.get(get_key(result))
+        if reference is None:
+            continue
+        ratio = result['median'] / reference['median'] if reference['median'] else 0
+        print(line.format(
+            result['benchmark'], result['shapes'], str(result['images']),
+            '{:.4f}'.format(reference['median']),
+            '{:.4f}'.format(result['median']),
+            '{:.2f}'.format(ratio)))
+
+
+def main(args=None):
+    arguments = parse_args(sys.argv[1:] if args is None else args)
+    if arguments.compare:
+        return compare(*arguments.compare)
+
+    from PySide2 import QtWidgets
+    application = QtWidgets.QApplication.instance()
+    if application is None:
+        application = QtWidgets.QApplication(sys.argv)
+    from benchmarks import suite
+    from hotbox_designer.painting import get_interning_stats
+
+    log = lambda message: sys.stderr.write(message + '\n')
+    results = suite.run(
+        sizes=arguments.sizes or suite.DEFAULT_SIZES,
+        repeat=arguments.repeat or suite.DEFAULT_REPEAT,
+        log=log)
+    output = {
+        'environment': get_environment(),
+        'results': results,
+        'interning': get_interning_stats()}
+    if arguments.output is None:
+        print(json.dumps(output, indent=2))
+        return
+    with open(arguments.output, 'w') as f:
+        json.dump(output, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+# coding=utf-8
+import time
+import shutil
+import tempfile
+from PySide2 import QtGui, QtCore
+from hotbox_designer import manager
+from hotbox_designer.applications import Standalone
+from hotbox_designer.data import (
+    save_datas, save_hotboxes_datas, load_hotboxes_datas, copy_hotbox_data)
+from hotbox_designer.interactive import Shape
+from hotbox_designer.painting import clear_interned
+from hotbox_designer.rendering import OPENGL, is_opengl_available
+from hotbox_designer.reader import (
+    HotboxReader, get_hover_candidates, set_shapes_hovered,
+    set_crossed_shapes_hovered)
+from hotbox_designer.designer.editarea import ShapeEditArea
+from hotbox_designer.designer.undo import UndoManager
+from benchmarks.synthetic import (
+    generate_hotbox, generate_labels, create_image, get_random_points)
+
+DEFAULT_SIZES = 10, 100, 1000, 10000
+DEFAULT_REPEAT = 5
+HOVER_EVENTS = 200
+DRAG_EVENTS = 50
+DRAG_SELECTION = 10
+UNDO_STEPS = 50
+SNAP = 5, 5
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def measure(function, repeat, iterations=1, setup=None):
+    """
+    run the function repeat times and return the durations in
+    milliseconds, divided by the number of iterations done per run. The
+    setup is called before each run, out of the timing, and its result is
+    given to the function.
+    """
+    durations = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = timer()
+        if setup is not None:
+            function(argument)
+        else:
+            function()
+        durations.append((timer() - start) * 1000 / iterations)
+    return durations
+
+
+def get_result(name, durations, shapes, images=False, aiming=False):
+    ordered = sorted(durations)
+    return {
+        'benchmark': name,
+        'shapes': shapes,
+        'images': images,
+        'aiming': aiming,
+        'unit': 'ms',
+        'repeat': len(durations),
+        'min': ordered[0],
+        'median': ordered[len(ordered) // 2],
+        'mean': sum(ordered) / len(ordered)}
+
+
+def benchmark_reader(hotbox, repeat, images):
+    count = len(hotbox['shapes'])
+    results = []
+
+    readers = []
+
+    def construct():
+        readers.append(HotboxReader(hotbox))
+    durations = measure(construct, repeat)
+    results.append(get_result(
+        'reader_construction', durations, count, images))
+
+    reader = readers[-1]
+    image = QtGui.QImage(reader.size(), QtGui.QImage.Format_ARGB32)
+
+    def invalidate():
+        image.fill(QtCore.Qt.transparent)
+        for shape in reader.shapes:
+            shape.invalidate_tiles()
+    durations = measure(lambda _: reader.render(image), repeat, setup=invalidate)
+    results.append(get_result('reader_paint_cold', durations, count, images))
+    durations = measure(lambda: reader.render(image), repeat)
+    results.append(get_result('reader_paint_warm', durations, count, images))
+
+    points = get_random_points(HOVER_EVENTS)
+    shapes = reader.interactive_shapes
+
+    def hover_brute():
+        for point in points:
+            set_shapes_hovered(shapes, point, False)
+    durations = measure(hover_brute, repeat, HOVER_EVENTS)
+    results.append(get_result('hover_brute_force', durations, count, images))
+
+    def hover_indexed():
+        hovered = []
+        for point in points:
+            candidates = get_hover_candidates(reader.index, hovered, point)
+            set_shapes_hovered(candidates, point, False)
+            hovered = [s for s in candidates if s.hovered]
+    durations = measure(hover_indexed, repeat, HOVER_EVENTS)
+    results.append(get_result('hover_indexed', durations, count, images))
+
+    center = reader.center
+
+    def aiming_legacy():
+        for point in points:
+            set_crossed_shapes_hovered(center, point, shapes, point)
+    durations = measure(aiming_legacy, repeat, HOVER_EVENTS)
+    results.append(get_result(
+        'aiming_legacy', durations, count, images, aiming=True))
+
+    def aiming_resolver():
+        for point in points:
+            set_crossed_shapes_hovered(
+                center, point, shapes, point, reader.aiming_resolver)
+    durations = measure(aiming_resolver, repeat, HOVER_EVENTS)
+    results.append(get_result(
+        'aiming_resolver', durations, count, images, aiming=True))
+
+    for reader in readers:
+        reader.deleteLater()
+    return results
+
+
+def benchmark_opengl_reader(hotbox, repeat, images):
+    count = len(hotbox['shapes'])
+    results = []
+    data = copy_hotbox_data(hotbox)
+    data['general']['renderer'] = OPENGL
+    reader = HotboxReader(data)
+    reader.show()
+
+    def invalidate():
+        for shape in reader.shapes:
+            shape.invalidate_tiles()
+    durations = measure(
+        lambda _: reader.canvas.grabFramebuffer(), repeat, setup=invalidate)
+    results.append(get_result(
+        'reader_paint_opengl_cold', durations, count, images))
+    durations = measure(reader.canvas.grabFramebuffer, repeat)
+    results.append(get_result(
+        'reader_paint_opengl_warm', durations, count, images))
+    reader.hide()
+    reader.deleteLater()
+    return results
+
+
+def benchmark_editor_drag(hotbox, repeat, images):
+    count = len(hotbox['shapes'])
+    data = copy_hotbox_data(hotbox)
+    area = ShapeEditArea(data['general'])
+    area.shapes = [Shape(options) for options in data['shapes']]
+    area.update_index()
+    area.selection.set(area.shapes[:DRAG_SELECTION])
+    area.update_selection()
+    area.show()
+    start = area.manipulator.rect.center().toPoint()
+
+    def set_cursor(point):
+        QtGui.QCursor.setPos(area.mapToGlobal(point))
+
+    def drag(_):
+        for index in range(DRAG_EVENTS):
+            set_cursor(start + QtCore.QPoint(index % 5, index % 3))
+            area.mouseMoveEvent(None)
+
+    def press():
+        set_cursor(start)
+        area.mousePressEvent(None)
+
+    durations = measure(drag, repeat, DRAG_EVENTS, setup=press)
+    area.mouseReleaseEvent(None)
+    area.hide()
+    area.deleteLater()
+    return [get_result('editor_drag_move', durations, count, images)]
+
+
+def benchmark_labels(hotbox, repeat):
+    count = len(hotbox['shapes'])
+    shapes = [Shape(options) for options in hotbox['shapes']]
+    image = QtGui.QImage(
+        hotbox['general']['width'], hotbox['general']['height'],
+        QtGui.QImage.Format_ARGB32)
+
+    def paint():
+        painter = QtGui.QPainter(image)
+        for shape in shapes:
+            shape.draw(painter)
+        painter.end()
+    durations = measure(paint, repeat)
+    return [get_result('labels_paint', durations, count)]
+
+
+def benchmark_editor_paint(hotbox, repeat, images):
+    count = len(hotbox['shapes'])
+    results = []
+    data = copy_hotbox_data(hotbox)
+    area = ShapeEditArea(data['general'])
+    area.setFixedSize(data['general']['width'], data['general']['height'])
+    area.shapes = [Shape(options) for options in data['shapes']]
+    image = QtGui.QImage(area.size(), QtGui.QImage.Format_ARGB32)
+    for name, snap in (('editor_paint', None), ('editor_paint_snap', SNAP)):
+        area.transform.snap = snap
+        durations = measure(lambda: area.render(image), repeat)
+        results.append(get_result(name, durations, count, images))
+    area.deleteLater()
+    return results
+
+
+def benchmark_undo(hotbox, repeat):
+    count = len(hotbox['shapes'])
+    results = []
+    data = copy_hotbox_data(hotbox)
+    managers = []
+
+    def record(_):
+        undo_manager = UndoManager(data)
+        for step in range(UNDO_STEPS):
+            if not data['shapes']:
+                break
+            options = data['shapes'][step % len(data['shapes'])]
+            options['shape.left'] += 1
+            undo_manager.set_data_modified(data)
+        managers.append(undo_manager)
+
+    durations = measure(record, repeat, UNDO_STEPS, setup=lambda: None)
+    results.append(get_result('undo_record', durations, count))
+
+    undo_manager = managers[-1]
+
+    def undo():
+        for _ in range(UNDO_STEPS):
+            undo_manager.undo()
+    durations = measure(undo, 1, UNDO_STEPS)
+    results.append(get_result('undo', durations, count))
+
+    def redo():
+        for _ in range(UNDO_STEPS):
+            undo_manager.redo()
+    durations = measure(redo, 1, UNDO_STEPS)
+    results.append(get_result('redo', durations, count))
+    return results
+
+
+def benchmark_files(hotbox, repeat, folder):
+    count = len(hotbox['shapes'])
+    results = []
+    application = Standalone(data_folder=folder)
+    hotboxes = [hotbox]
+    durations = measure(
+        lambda: save_datas(application.local_file, hotboxes), repeat)
+    results.append(get_result('save_verbose', durations, count))
+    durations = measure(
+        lambda: save_hotboxes_datas(application.local_file, hotboxes), repeat)
+    results.append(get_result('save_compact', durations, count))
+    durations = measure(
+        lambda: load_hotboxes_datas(application.local_file), repeat)
+    results.append(get_result('load_compact', durations, count))
+    save_datas(application.shared_file, [])
+    # the files watching and the telemetry are session setup, they would be
+    # timed and the watcher would keep polling the temporary files
+    watch_hotboxes_files = manager.watch_hotboxes_files
+    initialize_telemetry = manager.initialize_telemetry
+    manager.watch_hotboxes_files = lambda *_: None
+    manager.initialize_telemetry = lambda *_: None
+    try:
+        durations = measure(
+            lambda: manager.load_hotboxes(application), repeat)
+    finally:
+        manager.watch_hotboxes_files = watch_hotboxes_files
+        manager.initialize_telemetry = initialize_telemetry
+        manager.clear_loaded_hotboxes()
+        manager.usage_file = None
+    results.append(get_result('manager_load_hotboxes', durations, count))
+    return results
+
+
+def run(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, log=None):
+    folder = tempfile.mkdtemp(prefix='hotbox_benchmark_')
+    clear_interned()
+    opengl = is_opengl_available()
+    if not opengl and log is not None:
+        log('OpenGL unavailable, the OpenGL benchmarks are skipped')
+    try:
+        image_path = create_image(folder)
+        results = []
+        for count in sizes:
+            for images in (False, True):
+                if log is not None:
+                    log('{} shapes, images: {}'.format(count, images))
+                hotbox = generate_hotbox(
+                    count, images=images, image_path=image_path)
+                results.extend(benchmark_reader(hotbox, repeat, images))
+                if opengl:
+                    results.extend(
+                        benchmark_opengl_reader(hotbox, repeat, images))
+                results.extend(benchmark_editor_drag(hotbox, repeat, images))
+                results.extend(benchmark_editor_paint(hotbox, repeat, images))
+            hotbox = generate_hotbox(count)
+            results.extend(benchmark_undo(hotbox, repeat))
+            results.extend(benchmark_labels(generate_labels(count), repeat))
+            results.extend(benchmark_files(hotbox, repeat, folder))
+        return results
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
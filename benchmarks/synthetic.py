@@ -0,0 +1,79 @@
+# coding=utf-8
+import os
+import random
+from PySide2 import QtGui, QtCore
+from hotbox_designer.data import get_new_hotbox
+from hotbox_designer.templates import SQUARE_BUTTON, TEXT, BACKGROUND
+
+IMAGE_SIZE = 32
+LABEL_WIDTH = 100
+LABEL_HEIGHT = 40
+
+
+def generate_hotbox(count, images=False, aiming=False, image_path=None, seed=0):
+    """
+    generate a hotbox with count shapes randomly spread in a 900x600 area.
+    Most of them are buttons, a few are texts and backgrounds. If images is
+    True, a quarter of the shapes display the image_path.
+    """
+    generator = random.Random(seed)
+    hotbox = get_new_hotbox([])
+    hotbox['general']['name'] = 'benchmark_{}'.format(count)
+    hotbox['general']['aiming'] = aiming
+    width, height = hotbox['general']['width'], hotbox['general']['height']
+    templates = [SQUARE_BUTTON] * 8 + [TEXT, BACKGROUND]
+    for index in range(count):
+        options = generator.choice(templates).copy()
+        options['shape.width'] = float(generator.randint(10, 60))
+        options['shape.height'] = float(generator.randint(10, 30))
+        options['shape.left'] = float(
+            generator.randint(0, width - int(options['shape.width'])))
+        options['shape.top'] = float(
+            generator.randint(0, height - int(options['shape.height'])))
+        options['text.content'] = 'shape {}'.format(index)
+        if options['action.left']:
+            options['action.left.command'] = 'value = {}'.format(index)
+        if images and index % 4 == 0:
+            options['image.path'] = image_path
+            options['image.fit'] = bool(index % 8)
+        hotbox['shapes'].append(options)
+    return hotbox
+
+
+def generate_labels(count, seed=0):
+    """
+    generate a cheat sheet like hotbox: a grid of count text shapes with
+    labels fitting in their rect, some of them on two lines.
+    """
+    generator = random.Random(seed)
+    hotbox = get_new_hotbox([])
+    hotbox['general']['name'] = 'labels_{}'.format(count)
+    width = hotbox['general']['width']
+    columns = max(1, width // LABEL_WIDTH)
+    for index in range(count):
+        options = TEXT.copy()
+        options['shape.width'] = float(LABEL_WIDTH)
+        options['shape.height'] = float(LABEL_HEIGHT)
+        options['shape.left'] = float((index % columns) * LABEL_WIDTH)
+        options['shape.top'] = float((index // columns) * LABEL_HEIGHT)
+        options['text.content'] = 'label {}'.format(index)
+        if generator.random() < 0.3:
+            options['text.content'] += '\nshortcut'
+        hotbox['shapes'].append(options)
+    return hotbox
+
+
+def create_image(folder):
+    filename = os.path.join(folder, 'benchmark_image.png')
+    image = QtGui.QImage(
+        IMAGE_SIZE, IMAGE_SIZE, QtGui.QImage.Format_ARGB32)
+    image.fill(QtGui.QColor(QtCore.Qt.red))
+    image.save(filename)
+    return filename
+
+
+def get_random_points(count, width=900, height=600, seed=0):
+    generator = random.Random(seed)
+    return [
+        QtCore.QPoint(generator.randint(0, width), generator.randint(0, height))
+        for _ in range(count)]
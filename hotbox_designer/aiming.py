@@ -0,0 +1,109 @@
+# coding=utf-8
+from hotbox_designer.geometry import distance, segment_cross_rect
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class AimingResolver():
+    """
+    Resolve the shape aimed by the line joining the hotbox center and the
+    cursor. When NumPy is available, the shape rects are stored in a (n, 4)
+    array and the containment, crossing and distance tests are processed in
+    one batched pass. Otherwise, it falls back on get_crossed_shape.
+    Both return the same shape, ties resolving to the last shape in the
+    list, as the historical distance dict did.
+    """
+    def __init__(self, shapes, index=None):
+        self.shapes = list(shapes)
+        self.index = index
+        self.rects = None
+        if numpy is not None and self.shapes:
+            self.rects = numpy.array([
+                (s.rect.left(), s.rect.top(), s.rect.width(), s.rect.height())
+                for s in self.shapes], dtype=numpy.float64)
+
+    def resolve(self, point1, point2, cursor):
+        if self.rects is None:
+            return get_crossed_shape(
+                point1, point2, self.shapes, cursor, self.index)
+
+        left, top, width, height = self.rects.T
+        right = left + width
+        bottom = top + height
+        x, y = cursor.x(), cursor.y()
+        # mirror QRectF.contains, null rects never contain a point
+        contains = (
+            (numpy.minimum(left, right) <= x) &
+            (numpy.maximum(left, right) >= x) &
+            (numpy.minimum(top, bottom) <= y) &
+            (numpy.maximum(top, bottom) >= y) &
+            (width != 0) & (height != 0))
+        indexes = numpy.flatnonzero(contains)
+        if indexes.size:
+            return self.shapes[indexes[0]]
+
+        # same edges order than segment_cross_rect
+        crossed = (
+            segments_cross_segment(point1, point2, left, top, right, top) |
+            segments_cross_segment(point1, point2, right, top, right, bottom) |
+            segments_cross_segment(point1, point2, right, bottom, left, bottom) |
+            segments_cross_segment(point1, point2, left, bottom, left, top))
+        indexes = numpy.flatnonzero(crossed)
+        if not indexes.size:
+            return None
+
+        centers_x = left[indexes] + width[indexes] / 2
+        centers_y = top[indexes] + height[indexes] / 2
+        distances = numpy.sqrt(numpy.abs(
+            (x - centers_x) ** 2 + (y - centers_y) ** 2))
+        closests = numpy.flatnonzero(distances == distances.min())
+        return self.shapes[indexes[closests[-1]]]
+
+
+def segments_cross_segment(p1, p2, x3, y3, x4, y4):
+    """
+    batched version of geometry.segment_cross_segment. It tests the segment
+    p1, p2 against the segments defined by the coordinates arrays and
+    return an array of booleans.
+    """
+    dx1, dy1 = p2.x() - p1.x(), p2.y() - p1.y()
+    dx2, dy2 = x4 - x3, y4 - y3
+    dx3, dy3 = p1.x() - x3, p1.y() - y3
+    d = dx1 * dy2 - dy1 * dx2
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        t1 = (dx2 * dy3 - dy2 * dx3) / d
+        t2 = (dx1 * dy3 - dy1 * dx3) / d
+    return (d != 0) & (t1 >= 0) & (t1 <= 1) & (t2 >= 0) & (t2 <= 1)
+
+
+def get_crossed_shape(point1, point2, shapes, cursor, index=None):
+    """
+    pure python aiming resolution. If a spatial index is given, it is used
+    to find the candidates instead of the full shapes list.
+    """
+    # check first if a shape rect contain the cursor
+    if index is not None:
+        contains = index.at_point(cursor)
+        if contains:
+            return contains[0]
+    else:
+        for shape in shapes:
+            if shape.rect.contains(cursor):
+                return shape
+    # filter all shapes crossed by a virtual line who joins the
+    # hotspot and the cursor
+    if index is not None:
+        cshapes = index.crossing_segment(point1, point2)
+    else:
+        cshapes = [
+            s for s in shapes if segment_cross_rect(point1, point2, s.rect)]
+    if not cshapes:
+        return None
+    # process distance between all shape crossed and
+    # set the closest to the cursor hovered
+    shapedistances = {
+            distance(shape.rect.center(), cursor): shape
+            for shape in cshapes}
+    return shapedistances[min(shapedistances.keys())]
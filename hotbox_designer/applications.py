@@ -1,18 +1,25 @@
 # coding=utf-8
 import os
 import json
-from PySide2 import QtWidgets
+from functools import partial
+from collections import defaultdict
+from PySide2 import QtWidgets, QtCore
 from hotbox_designer.dialog import warning
-from hotbox_designer.languages import MEL, PYTHON, NUKE_TCL, NUKE_EXPRESSION, HSCRIPT
+from hotbox_designer.languages import (
+    MEL, PYTHON, NUKE_TCL, NUKE_EXPRESSION, HSCRIPT, EXECUTORS)
 
 HOTBOXES_FILENAME = 'hotboxes.json'
 SHARED_HOTBOXES_FILENAME = 'shared_hotboxes.json'
+HOTBOXES_USAGE_FILENAME = 'hotboxes_usage.json'
+CACHE_FOLDERNAME = 'hotboxes_cache'
+TELEMETRY_FILENAME = 'hotboxes_telemetry.jsonl'
 SETMODE_PRESS_RELEASE = 'open on press | close on release'
 SETMODE_SWITCH_ON_PRESS = 'switch on press'
+STANDALONE_FOLDER_ENVVAR = 'HOTBOXES_STANDALONE_FOLDER'
 
 
 def execute(command):
-    exec command
+    exec(command)
 
 
 class AbstractApplication(object):
@@ -21,7 +28,10 @@ class AbstractApplication(object):
         self.name = type(self).__name__
         folder = self.get_data_folder()
         self.local_file = os.path.join(folder, HOTBOXES_FILENAME)
-        self.shared_file = os.path.join(os.environ['HOTBOXES_ROOT'], SHARED_HOTBOXES_FILENAME)
+        self.usage_file = os.path.join(folder, HOTBOXES_USAGE_FILENAME)
+        self.cache_folder = os.path.join(folder, CACHE_FOLDERNAME)
+        self.telemetry_file = os.path.join(folder, TELEMETRY_FILENAME)
+        self.shared_file = os.path.join(self.get_shared_folder(), SHARED_HOTBOXES_FILENAME)
         self.main_window = self.get_main_window()
         self.reader_parent = self.get_reader_parent()
         self.available_languages = self.get_available_languages()
@@ -31,6 +41,10 @@ class AbstractApplication(object):
     def get_data_folder():
         raise NotImplementedError
 
+    @staticmethod
+    def get_shared_folder():
+        return os.environ['HOTBOXES_ROOT']
+
     @staticmethod
     def get_reader_parent():
         raise NotImplementedError
@@ -228,3 +242,106 @@ class Houdini(AbstractApplication):
         from functools import partial
 
         set_shortcut(sequence, self.main_window, partial(execute, switch_cmd))
+
+
+class FakeExecutor(object):
+    """
+    stand-in for the host commands interpreters, the commands are recorded
+    by language instead of being executed. The python commands are given
+    compiled by the languages module.
+    """
+    def __init__(self):
+        self.calls = defaultdict(list)
+
+    def execute(self, language, code):
+        self.calls[language].append(code)
+
+    def count(self, language=None):
+        if language is not None:
+            return len(self.calls[language])
+        return sum(len(calls) for calls in self.calls.values())
+
+    def clear(self):
+        self.calls.clear()
+
+
+# shared by every Standalone instance, the hotbox commands create their own.
+fake_executor = FakeExecutor()
+_installed_executor = None
+_standalone_window = None
+_standalone_shortcuts = {}
+
+
+class Standalone(AbstractApplication):
+    """
+    application context for a plain python process with a QApplication
+    running, used to test and profile the hotboxes out of any host.
+    The data folder defaults to the HOTBOXES_STANDALONE_FOLDER environment
+    variable or ~/.hotbox_designer, the shared folder to the data folder.
+    The commands of every language are sent to the executor. It is
+    installed by the first instance, the next ones (e.g. created by the
+    hotkey commands) only replace it if an executor is given explicitly.
+    """
+    def __init__(self, data_folder=None, shared_folder=None, executor=None):
+        self.data_folder = data_folder or os.environ.get(
+            STANDALONE_FOLDER_ENVVAR, os.path.expanduser('~/.hotbox_designer'))
+        self.shared_folder = shared_folder or self.data_folder
+        if not os.path.exists(self.data_folder):
+            os.makedirs(self.data_folder)
+        self.executor = executor or _installed_executor or fake_executor
+        super(Standalone, self).__init__()
+        if executor is not None or _installed_executor is None:
+            self.install_executor()
+
+    def get_data_folder(self):
+        return self.data_folder
+
+    def get_shared_folder(self):
+        return self.shared_folder
+
+    @staticmethod
+    def get_main_window():
+        global _standalone_window
+        for widget in QtWidgets.QApplication.topLevelWidgets():
+            if widget.inherits('QMainWindow'):
+                return widget
+        if _standalone_window is None:
+            # the shortcuts are only triggered if their parent is visible,
+            # even in the application context. The fallback window is shown
+            # but never appears on screen.
+            _standalone_window = QtWidgets.QMainWindow()
+            _standalone_window.setWindowTitle('Hotbox designer standalone')
+            _standalone_window.setAttribute(QtCore.Qt.WA_DontShowOnScreen)
+            _standalone_window.show()
+        return _standalone_window
+
+    @staticmethod
+    def get_reader_parent():
+        return None
+
+    @staticmethod
+    def get_available_languages():
+        return [PYTHON, MEL, NUKE_TCL, NUKE_EXPRESSION, HSCRIPT]
+
+    @staticmethod
+    def get_available_set_hotkey_modes():
+        return [SETMODE_SWITCH_ON_PRESS]
+
+    def install_executor(self):
+        global _installed_executor
+        _installed_executor = self.executor
+        for language in self.available_languages:
+            EXECUTORS[language] = partial(self.executor.execute, language)
+
+    def set_hotkey(self, name, mode, sequence, open_cmd, close_cmd, switch_cmd):
+        from hotbox_designer.qtutils import set_shortcut
+
+        shortcut = _standalone_shortcuts.pop(name, None)
+        if shortcut is not None:
+            shortcut.setParent(None)
+        shortcut = set_shortcut(
+            sequence, self.main_window, partial(execute, switch_cmd))
+        # the fallback main window is never active, a window shortcut on it
+        # would never be triggered
+        shortcut.setContext(QtCore.Qt.ApplicationShortcut)
+        _standalone_shortcuts[name] = shortcut
@@ -1,10 +1,99 @@
 # coding=utf-8
 import os
 import json
+import pickle
+import shutil
+import hashlib
+import threading
+from multiprocessing.pool import ThreadPool
+from collections import OrderedDict
 from hotbox_designer.templates import HOTBOX
+from hotbox_designer.schema import SCHEMA_VERSION, migrate_hotbox_data, is_up_to_date
 
 
 DEFAULT_NAME = 'MyHotbox_{}'
+LOADING_THREADS = 8
+# python 2 and 3 can both read this pickle protocol
+CACHE_PICKLE_PROTOCOL = 2
+COMPACT_FORMAT = 'compact'
+COMPACT_FORMAT_VERSION = 1
+# the shapes defaults the compact shapes are stored against, by format
+# version. They are frozen copies of the templates: a template default can
+# change without changing the hotboxes already saved.
+_FORMAT_1_SQUARE_BUTTON = {
+    'shape': 'square',
+    'shape.left': 0.0,
+    'shape.top': 0.0,
+    'shape.width': 120.0,
+    'shape.height': 25.0,
+    'border': True,
+    'borderwidth.normal': 1.0,
+    'borderwidth.hovered': 1.25,
+    'borderwidth.clicked': 2,
+    'bordercolor.normal': '#000000',
+    'bordercolor.hovered': '#393939',
+    'bordercolor.clicked': '#FFFFFF',
+    'bordercolor.transparency': 0,
+    'bgcolor.normal': '#888888',
+    'bgcolor.hovered': '#AAAAAA',
+    'bgcolor.clicked': '#DDDDDD',
+    'bgcolor.transparency': 0,
+    'text.content': 'Button',
+    'text.size': 12,
+    'text.bold': False,
+    'text.italic': False,
+    'text.color': '#FFFFFF',
+    'text.valign': 'center',
+    'text.halign': 'center',
+    'action.left': True,
+    'action.left.close': False,
+    'action.left.language': 'python',
+    'action.left.command': '',
+    'action.left.mode': 'inline',
+    'action.right': False,
+    'action.right.close': False,
+    'action.right.language': 'python',
+    'action.right.command': '',
+    'action.right.mode': 'inline',
+    'image.path': '',
+    'image.fit': True,
+    'image.height': 32,
+    'image.width': 32}
+_FORMAT_1_TEXT = dict(_FORMAT_1_SQUARE_BUTTON, **{
+    'shape.width': 200.0,
+    'shape.height': 50.0,
+    'border': False,
+    'borderwidth.normal': 0,
+    'borderwidth.hovered': 0,
+    'borderwidth.clicked': 0,
+    'bgcolor.transparency': 255,
+    'text.content': 'Text',
+    'text.size': 16,
+    'text.bold': True,
+    'text.valign': 'top',
+    'text.halign': 'left',
+    'action.left': False,
+    'image.fit': False})
+_FORMAT_1_BACKGROUND = dict(_FORMAT_1_SQUARE_BUTTON, **{
+    'shape.width': 400.0,
+    'shape.height': 400.0,
+    'border': False,
+    'borderwidth.normal': 0,
+    'borderwidth.hovered': 0,
+    'borderwidth.clicked': 0,
+    'bordercolor.normal': '#888888',
+    'bordercolor.hovered': '#888888',
+    'bordercolor.clicked': '#888888',
+    'bgcolor.hovered': '#888888',
+    'bgcolor.clicked': '#888888',
+    'text.content': '',
+    'action.left': False,
+    'image.fit': False})
+COMPACT_FORMAT_TEMPLATES = {
+    1: OrderedDict((
+        ('square_button', _FORMAT_1_SQUARE_BUTTON),
+        ('text', _FORMAT_1_TEXT),
+        ('background', _FORMAT_1_BACKGROUND)))}
 TRIGGERING_TYPES = 'click only', 'click or close'
 HOTBOX_REPRESENTATION = """
 <b>Name </b>{name}<br>
@@ -12,6 +101,7 @@ HOTBOX_REPRESENTATION = """
 <b>Triggering </b>{triggering}<br>
 <b>Aiming </b>{aiming}<br>
 <b>Close on leave </b>{leaveclose}<br>
+<b>Renderer </b>{renderer}<br>
 """
 
 
@@ -34,9 +124,130 @@ def get_valid_name(hotboxes, proposal=None):
     return name
 
 
-def load_hotboxes_datas(filename):
+def load_hotboxes_datas(filename, rewrite_migrated=False):
+    """
+    If rewrite_migrated is True and some hotboxes were saved with an older
+    schema, the file is saved back migrated to not pay the migration again.
+    """
     datas = load_json(filename, default=[])
-    return [ensure_old_data_compatible(data) for data in datas]
+    migrated = not all(is_up_to_date(data) for data in datas)
+    datas = [read_hotbox_data(data) for data in datas]
+    if migrated and rewrite_migrated:
+        try:
+            save_hotboxes_datas(filename, datas)
+        except (IOError, OSError):
+            pass
+    return datas
+
+
+def read_hotbox_data(data):
+    """
+    convert a hotbox data read from a file, whatever its format and its
+    version, to the current hotbox data structure.
+    """
+    return migrate_hotbox_data(expand_hotbox_data(data))
+
+
+def load_hotboxes_links(links, threads=LOADING_THREADS, cache_folder=None):
+    """
+    read and parse the linked hotbox files concurrently. It returns the
+    hotboxes data in the links order with None for the files which failed
+    to load, and the list of (link, error message) of those failures.
+    """
+    if not links:
+        return [], []
+    pool = ThreadPool(min(threads, len(links)))
+    try:
+        results = pool.map(
+            lambda link: load_hotbox_link(link, cache_folder), links)
+    finally:
+        pool.close()
+        pool.join()
+    datas = [data for data, _ in results]
+    errors = [
+        (link, error) for link, (_, error) in zip(links, results)
+        if error is not None]
+    return datas, errors
+
+
+def load_hotbox_link(link, cache_folder=None):
+    """
+    If a cache folder is given, the linked file is only read when its size
+    or its modification time differ from the cached version, or when the
+    cache was written with another schema version.
+    """
+    try:
+        stat = os.stat(link)
+    except (IOError, OSError):
+        return None, 'file not found'
+    key = link, stat.st_size, stat.st_mtime, SCHEMA_VERSION
+    if cache_folder is not None:
+        data = load_cached_hotbox(cache_folder, key)
+        if data is not None:
+            return data, None
+    try:
+        data = load_json(link)
+    except (IOError, OSError, ValueError) as e:
+        return None, str(e)
+    if data is None:
+        return None, 'file not found'
+    try:
+        data = read_hotbox_data(data)
+    except (KeyError, TypeError, AttributeError, ValueError) as e:
+        return None, 'invalid hotbox data: {}'.format(e)
+    if cache_folder is not None:
+        save_cached_hotbox(cache_folder, key, data)
+    return data, None
+
+
+def get_cache_filename(cache_folder, link):
+    if not isinstance(link, bytes):
+        link = link.encode('utf-8')
+    name = hashlib.sha1(link).hexdigest()
+    return os.path.join(cache_folder, name + '.pickle')
+
+
+def load_cached_hotbox(cache_folder, key):
+    """
+    return the cached hotbox data if it matches the key (link, size, mtime,
+    schema version) or None. The cached data are already migrated, a cache
+    written before a new migration is a miss. An unreadable cache file is
+    considered as a cache miss.
+    """
+    filename = get_cache_filename(cache_folder, key[0])
+    if not os.path.exists(filename):
+        return None
+    try:
+        with open(filename, 'rb') as f:
+            cached_key, data = pickle.load(f)
+    except Exception:
+        return None
+    return data if tuple(cached_key) == key else None
+
+
+def save_cached_hotbox(cache_folder, key, data):
+    try:
+        if not os.path.exists(cache_folder):
+            os.makedirs(cache_folder)
+    except OSError:
+        # folder created meanwhile by another loading thread
+        pass
+    filename = get_cache_filename(cache_folder, key[0])
+    try:
+        write_atomically(
+            filename,
+            lambda f: pickle.dump((key, data), f, CACHE_PICKLE_PROTOCOL),
+            binary=True)
+    except (IOError, OSError):
+        pass
+
+
+def clear_cache(cache_folder):
+    if not os.path.exists(cache_folder):
+        return
+    for filename in os.listdir(cache_folder):
+        if filename.endswith('.pickle'):
+            os.remove(os.path.join(cache_folder, filename))
 
 
 def load_json(filename, default=None):
@@ -47,34 +258,107 @@ def load_json(filename, default=None):
 
 
 def save_datas(filename, hotboxes_data):
-    with open(filename, 'w') as f:
-        json.dump(hotboxes_data, f, indent=2)
+    write_atomically(filename, lambda f: json.dump(hotboxes_data, f, indent=2))
 
 
-def copy_hotbox_data(data):
-    copied = {'general': data['general'].copy(), 'shapes': [shape.copy() for shape in data['shapes']]}
-    return copied
+def save_hotboxes_datas(filename, hotboxes_data):
+    save_datas(filename, [compact_hotbox_data(data) for data in hotboxes_data])
 
 
-def ensure_old_data_compatible(data):
+def compact_hotbox_data(data):
     """
-    Tests and update data done with old version of the script
-    This function contain all the data structure history to conversion
+    return the hotbox data in the compact format: each shape only stores
+    the options which differ from the closest shape template and the name
+    of this template. expand_hotbox_data does the opposite conversion.
     """
+    return {
+        'format': COMPACT_FORMAT,
+        'format_version': COMPACT_FORMAT_VERSION,
+        'schema_version': SCHEMA_VERSION,
+        'general': data['general'].copy(),
+        'shapes': [compact_shape_options(s) for s in data['shapes']]}
+
+
+def compact_shape_options(options):
+    compacts = []
+    templates = COMPACT_FORMAT_TEMPLATES[COMPACT_FORMAT_VERSION]
+    for name, template in templates.items():
+        compact = {
+            key: value for key, value in options.items()
+            if key not in template or template[key] != value}
+        compact['template'] = name
+        compacts.append(compact)
+    return min(compacts, key=len)
+
+
+def expand_hotbox_data(data):
+    """
+    return the hotbox data with the shapes options complete. The data
+    saved in the verbose format are returned as is.
+    """
+    if data.get('format') != COMPACT_FORMAT:
+        return data
+    format_version = data.get('format_version', 1)
+    if format_version not in COMPACT_FORMAT_TEMPLATES:
+        raise ValueError('hotbox format version not supported')
+    templates = COMPACT_FORMAT_TEMPLATES[format_version]
+    expanded = {
+        'general': data['general'],
+        'shapes': [expand_shape_options(s, templates) for s in data['shapes']]}
+    if 'schema_version' in data:
+        expanded['schema_version'] = data['schema_version']
+    return expanded
+
+
+def expand_shape_options(compact, templates):
+    options = compact.copy()
+    template = templates[options.pop('template')]
+    expanded = template.copy()
+    expanded.update(options)
+    return expanded
+
+
+def write_atomically(filename, write, binary=False):
+    """
+    The data are written in a temporary file next to the destination then
+    renamed over it, an interrupted save can't leave a truncated file.
+    """
+    temp = '{}.{}.{}.tmp'.format(
+        filename, os.getpid(), threading.current_thread().ident)
     try:
-        del data['submenu']
-    except:
-        pass
-    try:
-        data['general']['submenu']
-    except KeyError:
-        data['general']['submenu'] = False
+        with open(temp, 'wb' if binary else 'w') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(filename):
+            shutil.copymode(filename, temp)
+        replace_file(temp, filename)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def replace_file(source, destination):
+    if hasattr(os, 'replace'):
+        return os.replace(source, destination)
+    # python 2 on windows can't rename over an existing file
+    if os.name == 'nt' and os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
+
+
+def get_file_signature(filename):
     try:
-        data['general']['leaveclose']
-    except KeyError:
-        data['general']['leaveclose'] = False
+        stat = os.stat(filename)
+    except (IOError, OSError):
+        return None
+    return stat.st_size, stat.st_mtime
+
 
-    return data
+def copy_hotbox_data(data):
+    copied = {'general': data['general'].copy(), 'shapes': [shape.copy() for shape in data['shapes']]}
+    return copied
 
 
 def load_templates():
@@ -84,7 +368,7 @@ def load_templates():
     for file_ in files:
         filepath = os.path.join(path, file_)
         with open(filepath, 'r') as f:
-            templates.append(json.load(f))
+            templates.append(read_hotbox_data(json.load(f)))
     return templates
 
 
@@ -94,4 +378,5 @@ def hotbox_data_to_html(data):
         submenu=data['general']['submenu'],
         triggering=data['general']['triggering'],
         aiming=data['general']['aiming'],
-        leaveclose=data['general']['leaveclose'])
+        leaveclose=data['general']['leaveclose'],
+        renderer=data['general']['renderer'])
@@ -5,13 +5,13 @@ from hotbox_designer.templates import SQUARE_BUTTON, TEXT, BACKGROUND
 from hotbox_designer.interactive import Shape
 from hotbox_designer.geometry import get_combined_rects
 from hotbox_designer.qtutils import set_shortcut
-from hotbox_designer.data import copy_hotbox_data
 from hotbox_designer.arrayutils import (move_elements_to_array_end, move_elements_to_array_begin,
                                         move_up_array_elements, move_down_array_elements)
 
 from .editarea import ShapeEditArea
 from .menu import MenuWidget
 from .attributes import AttributeEditor
+from .undo import UndoManager, apply_values
 
 
 class HotboxEditor(QtWidgets.QWidget):
@@ -32,6 +32,8 @@ class HotboxEditor(QtWidgets.QWidget):
         self.shape_editor.centerMoved.connect(self.move_center)
         method = self.set_data_modified
         self.shape_editor.increaseUndoStackRequested.connect(method)
+        self.shape_editor.gestureStarted.connect(self.start_gesture)
+        self.shape_editor.gestureFinished.connect(self.commit_gesture)
 
         self.menu = MenuWidget()
         self.menu.copyRequested.connect(self.copy)
@@ -110,19 +112,55 @@ class HotboxEditor(QtWidgets.QWidget):
         self.shape_editor.repaint()
 
     def undo(self):
-        result = self.undo_manager.undo()
-        if result is False:
+        patch = self.undo_manager.undo()
+        if patch is None:
             return
-        data = self.undo_manager.data
-        self.set_hotbox_data(data)
+        self.apply_patch(patch)
         self.hotboxDataModified.emit(self.hotbox_data())
 
     def redo(self):
-        self.undo_manager.redo()
-        data = self.undo_manager.data
-        self.set_hotbox_data(data)
+        patch = self.undo_manager.redo()
+        if patch is None:
+            return
+        self.apply_patch(patch)
         self.hotboxDataModified.emit(self.hotbox_data())
 
+    def apply_patch(self, patch):
+        """
+        apply an undo manager patch on the existing shapes instead of
+        rebuilding all of them.
+        """
+        apply_values(self.options, patch['general'])
+        size = self.options['width'], self.options['height']
+        self.shape_editor.setFixedSize(*size)
+        self.menu.blockSignals(True)
+        self.menu.set_size_values(*size)
+        self.menu.set_center_values(
+            self.options['centerx'], self.options['centery'])
+        self.menu.blockSignals(False)
+
+        editor = self.shape_editor
+        shapes = {id(shape.options): shape for shape in editor.shapes}
+        for identifier, (options, values) in patch['shapes'].items():
+            apply_values(options, values)
+            shape = shapes.get(identifier)
+            if shape is None:
+                continue
+            shape.decode_options()
+            if patch['order'] is None:
+                editor.index.update(shape)
+
+        if patch['order'] is not None:
+            editor.shapes = [
+                shapes.get(id(options)) or Shape(options)
+                for options in patch['order']]
+            for shape in list(editor.selection):
+                if shape not in editor.shapes:
+                    editor.selection.remove(shape)
+            editor.update_index()
+        editor.update_selection()
+        editor.repaint()
+
     def deselect_all(self):
         self.shape_editor.selection.clear()
         self.shape_editor.update_selection()
@@ -138,9 +176,27 @@ class HotboxEditor(QtWidgets.QWidget):
         self.shape_editor.update_selection()
         self.shape_editor.repaint()
 
-    def set_data_modified(self):
-        self.undo_manager.set_data_modified(self.hotbox_data())
-        self.hotboxDataModified.emit(self.hotbox_data())
+    def set_data_modified(self, merge_key=None):
+        """
+        record the modification in the undo stack. Modifications done during
+        a gesture in the edit area are merged and notified once the gesture
+        is finished. The ones sharing a merge key are merged when they are
+        done in a short delay (e.g. text edited in a field).
+        """
+        data = self.hotbox_data()
+        modified = self.undo_manager.set_data_modified(data, merge_key)
+        if modified and not self.undo_manager.in_transaction:
+            self.hotboxDataModified.emit(data)
+
+    def start_gesture(self):
+        # gestures don't nest, close a gesture which missed its release
+        if self.undo_manager.in_transaction:
+            self.commit_gesture()
+        self.undo_manager.begin()
+
+    def commit_gesture(self):
+        if self.undo_manager.commit():
+            self.hotboxDataModified.emit(self.hotbox_data())
 
     def use_snap(self, state):
         snap = self.menu.snap_values() if state else None
@@ -158,48 +214,39 @@ class HotboxEditor(QtWidgets.QWidget):
 
     def option_set(self, option, value):
         for shape in self.shape_editor.selection:
-            shape.options[option] = value
+            shape.set_option(option, value)
         self.shape_editor.repaint()
-        self.set_data_modified()
+        self.set_data_modified(merge_key=self._get_merge_key(option))
 
     def editor_size_changed(self):
         size = self.menu.get_size()
         self.shape_editor.setFixedSize(size)
         self.options['width'] = size.width()
         self.options['height'] = size.height()
-        self.set_data_modified()
+        self.set_data_modified(merge_key='size')
 
     def move_center(self, x, y):
         self.options['centerx'] = x
         self.options['centery'] = y
         self.menu.set_center_values(x, y)
         self.shape_editor.repaint()
-        self.set_data_modified()
+        self.set_data_modified(merge_key='center')
 
     def rect_modified(self, option, value):
         shapes = self.shape_editor.selection
         for shape in shapes:
-            shape.options[option] = value
-            if option == 'shape.height':
-                shape.rect.setHeight(value)
-                continue
-            elif option == 'shape.width':
-                shape.rect.setWidth(value)
-                continue
-
-            width = shape.rect.width()
-            height = shape.rect.height()
-            if option == 'shape.left':
-                shape.rect.setLeft(value)
-            else:
-                shape.rect.setTop(value)
-            shape.rect.setWidth(width)
-            shape.rect.setHeight(height)
+            shape.set_option(option, value)
+            self.shape_editor.index.update(shape)
 
         rects = [shape.rect for shape in self.shape_editor.selection]
         rect = get_combined_rects(rects)
         self.shape_editor.manipulator.set_rect(rect)
         self.shape_editor.repaint()
+        self.set_data_modified(merge_key=self._get_merge_key(option))
+
+    def _get_merge_key(self, option):
+        shapes = tuple(id(shape) for shape in self.shape_editor.selection)
+        return option, shapes
 
     def selection_changed(self):
         shapes = self.shape_editor.selection
@@ -211,10 +258,12 @@ class HotboxEditor(QtWidgets.QWidget):
         shape = Shape(options)
         shape.rect.moveCenter(self.shape_editor.rect().center())
         shape.synchronize_rect()
+        shape.synchronize_image_rect()
         if before is True:
             self.shape_editor.shapes.insert(0, shape)
         else:
             self.shape_editor.shapes.append(shape)
+        self.shape_editor.update_index()
         self.shape_editor.repaint()
         self.set_data_modified()
 
@@ -227,6 +276,7 @@ class HotboxEditor(QtWidgets.QWidget):
         array = self.shape_editor.shapes
         elements = self.shape_editor.selection
         move_down_array_elements(array, elements)
+        self.shape_editor.update_index()
         self.shape_editor.repaint()
         self.set_data_modified()
 
@@ -234,6 +284,7 @@ class HotboxEditor(QtWidgets.QWidget):
         array = self.shape_editor.shapes
         elements = self.shape_editor.selection
         move_up_array_elements(array, elements)
+        self.shape_editor.update_index()
         self.shape_editor.repaint()
         self.set_data_modified()
 
@@ -241,6 +292,7 @@ class HotboxEditor(QtWidgets.QWidget):
         array = self.shape_editor.shapes
         elements = self.shape_editor.selection
         self.shape_editor.shapes = move_elements_to_array_end(array, elements)
+        self.shape_editor.update_index()
         self.shape_editor.repaint()
         self.set_data_modified()
 
@@ -249,6 +301,7 @@ class HotboxEditor(QtWidgets.QWidget):
         elements = self.shape_editor.selection
         shapes = move_elements_to_array_begin(array, elements)
         self.shape_editor.shapes = shapes
+        self.shape_editor.update_index()
         self.shape_editor.repaint()
         self.set_data_modified()
 
@@ -256,6 +309,7 @@ class HotboxEditor(QtWidgets.QWidget):
         for shape in reversed(self.shape_editor.selection.shapes):
             self.shape_editor.shapes.remove(shape)
             self.shape_editor.selection.remove(shape)
+        self.shape_editor.update_index()
         rects = [shape.rect for shape in self.shape_editor.selection]
         rect = get_combined_rects(rects)
         self.shape_editor.manipulator.set_rect(rect)
@@ -270,54 +324,8 @@ class HotboxEditor(QtWidgets.QWidget):
         self.shape_editor.options = self.options
         shapes = [Shape(options) for options in hotbox_data['shapes']]
         self.shape_editor.shapes = shapes
+        self.shape_editor.update_index()
         self.shape_editor.manipulator.rect = None
         self.shape_editor.repaint()
         if reset_stacks is True:
             self.undo_manager.reset_stacks()
-
-
-class UndoManager:
-    def __init__(self, data):
-        self._current_state = data
-        self._modified = False
-        self._undo_stack = []
-        self._redo_stack = []
-
-    @property
-    def data(self):
-        return copy_hotbox_data(self._current_state)
-
-    def undo(self):
-        if not self._undo_stack:
-            print('no undo stack')
-            return False
-        self._redo_stack.append(copy_hotbox_data(self._current_state))
-        self._current_state = copy_hotbox_data(self._undo_stack[-1])
-        del self._undo_stack[-1]
-        return True
-
-    def redo(self):
-        if not self._redo_stack:
-            return False
-
-        self._undo_stack.append(copy_hotbox_data(self._current_state))
-        self._current_state = copy_hotbox_data(self._redo_stack[-1])
-        del self._redo_stack[-1]
-        return True
-
-    def set_data_modified(self, data):
-        self._redo_stack = []
-        self._undo_stack.append(copy_hotbox_data(self._current_state))
-        self._current_state = copy_hotbox_data(data)
-        self._modified = True
-
-    def set_data_saved(self):
-        self._modified = False
-
-    @property
-    def data_saved(self):
-        return not self._modified
-
-    def reset_stacks(self):
-        self._undo_stack = []
-        self._redo_stack = []
@@ -5,6 +5,7 @@ from hotbox_designer.colorwheel import ColorDialog
 from hotbox_designer.qtutils import icon, VALIGNS, HALIGNS
 from hotbox_designer.widgets import Title, BoolCombo, WidgetToggler, FloatEdit, BrowseEdit, ColorEdit
 from hotbox_designer.designer.highlighter import get_highlighter
+from hotbox_designer.languages import EXECUTION_MODES
 
 LEFT_CELL_WIDTH = 80
 SHAPE_TYPES = 'square', 'round'
@@ -342,6 +343,10 @@ class ActionSettings(QtWidgets.QWidget):
         self._llanguage = QtWidgets.QComboBox()
         method = partial(self.language_changed, 'left')
         self._llanguage.currentIndexChanged.connect(method)
+        self._lmode = QtWidgets.QComboBox()
+        self._lmode.addItems(EXECUTION_MODES)
+        method = partial(self.mode_changed, 'left')
+        self._lmode.currentIndexChanged.connect(method)
         self._lcommand = QtWidgets.QPlainTextEdit()
         self._lcommand.setFixedHeight(100)
         self._lsave = QtWidgets.QPushButton('save command')
@@ -359,6 +364,10 @@ class ActionSettings(QtWidgets.QWidget):
         self._rlanguage = QtWidgets.QComboBox()
         method = partial(self.language_changed, 'right')
         self._rlanguage.currentIndexChanged.connect(method)
+        self._rmode = QtWidgets.QComboBox()
+        self._rmode.addItems(EXECUTION_MODES)
+        method = partial(self.mode_changed, 'right')
+        self._rmode.currentIndexChanged.connect(method)
         self._rcommand = QtWidgets.QPlainTextEdit()
         self._rcommand.setFixedHeight(100)
         self._rsave = QtWidgets.QPushButton('save command')
@@ -372,12 +381,14 @@ class ActionSettings(QtWidgets.QWidget):
         self.layout.addRow('Has command', self._lactive)
         self.layout.addRow('Close Hotbox', self._lclose)
         self.layout.addRow('Language', self._llanguage)
+        self.layout.addRow('Execution', self._lmode)
         self.layout.addRow(self._lcommand)
         self.layout.addRow(self._lsave)
         self.layout.addRow(Title('Right click'))
         self.layout.addRow('Has command', self._ractive)
         self.layout.addRow('Close Hotbox', self._rclose)
         self.layout.addRow('Language', self._rlanguage)
+        self.layout.addRow('Execution', self._rmode)
         self.layout.addRow(self._rcommand)
         self.layout.addRow(self._rsave)
         for label in self.findChildren(QtWidgets.QLabel):
@@ -399,6 +410,10 @@ class ActionSettings(QtWidgets.QWidget):
         highlighter(text_edit.document())
         self.optionSet.emit(option, language)
 
+    def mode_changed(self, side, *_):
+        combo = self._lmode if side == 'left' else self._rmode
+        self.optionSet.emit('action.' + side + '.mode', combo.currentText())
+
     def save_command(self, side):
         text_edit = self._lcommand if side == 'left' else self._rcommand
         option = 'action.' + side + '.command'
@@ -418,6 +433,10 @@ class ActionSettings(QtWidgets.QWidget):
         value = str(values[0]) if len(values) == 1 else None
         self._llanguage.setCurrentText(value)
 
+        values = list({option['action.left.mode'] for option in options})
+        value = str(values[0]) if len(values) == 1 else None
+        self._lmode.setCurrentText(value)
+
         if not options or len(options) > 1 or not options[0]['action.left']:
             self._lcommand.setPlainText('')
             self._lcommand.setEnabled(False)
@@ -440,6 +459,10 @@ class ActionSettings(QtWidgets.QWidget):
         value = str(values[0]) if len(values) == 1 else None
         self._rlanguage.setCurrentText(value)
 
+        values = list({option['action.right.mode'] for option in options})
+        value = str(values[0]) if len(values) == 1 else None
+        self._rmode.setCurrentText(value)
+
         if not options or len(options) > 1 or not options[0]['action.right']:
             self._rcommand.setPlainText('')
             self._rcommand.setEnabled(False)
@@ -452,12 +475,14 @@ class ActionSettings(QtWidgets.QWidget):
     def set_left_enabled(self, state):
         self._lclose.setEnabled(state)
         self._llanguage.setEnabled(state)
+        self._lmode.setEnabled(state)
         self._lcommand.setEnabled(state)
         self._lsave.setEnabled(state)
 
     def set_right_enabled(self, state):
         self._rclose.setEnabled(state)
         self._rlanguage.setEnabled(state)
+        self._rmode.setEnabled(state)
         self._rcommand.setEnabled(state)
         self._rsave.setEnabled(state)
 
@@ -4,11 +4,14 @@ from hotbox_designer.interactive import Manipulator, SelectionSquare
 from hotbox_designer.geometry import Transform, snap, get_combined_rects
 from hotbox_designer.painting import draw_editor, draw_editor_center
 from hotbox_designer.qtutils import get_cursor
+from hotbox_designer.spatialindex import ShapeIndex
 
 
 class ShapeEditArea(QtWidgets.QWidget):
     selectedShapesChanged = QtCore.Signal()
     increaseUndoStackRequested = QtCore.Signal()
+    gestureStarted = QtCore.Signal()
+    gestureFinished = QtCore.Signal()
     centerMoved = QtCore.Signal(int, int)
 
     def __init__(self, options, parent=None):
@@ -23,6 +26,8 @@ class ShapeEditArea(QtWidgets.QWidget):
         self.transform = Transform()
 
         self.shapes = []
+        self.index = ShapeIndex()
+        self.hovered_shapes = []
         self.clicked_shape = None
         self.clicked = False
         self.handeling = False
@@ -47,8 +52,11 @@ class ShapeEditArea(QtWidgets.QWidget):
             self.repaint()
             return
 
-        for shape in self.shapes:
-            shape.set_hovered(cursor)
+        for shape in self.hovered_shapes:
+            shape.hovered = False
+        self.hovered_shapes = self.index.at_point(cursor)
+        for shape in self.hovered_shapes:
+            shape.hovered = True
 
         if self.selection_square.handling:
             self.selection_square.handle(cursor)
@@ -64,9 +72,10 @@ class ShapeEditArea(QtWidgets.QWidget):
         elif rect is not None and rect.contains(cursor):
             self.transform.move([s.rect for s in self.selection], cursor)
             self.manipulator.update_geometries()
-        for shape in self.shapes:
+        for shape in self.selection:
             shape.synchronize_rect()
-            shape.synchronize_image()
+            shape.synchronize_image_rect()
+            self.index.update(shape)
         self.increase_undo_on_release = True
         self.selectedShapesChanged.emit()
         self.repaint()
@@ -77,6 +86,7 @@ class ShapeEditArea(QtWidgets.QWidget):
         direction = self.manipulator.get_direction(cursor)
         self.clicked = True
         self.transform.direction = direction
+        self.gestureStarted.emit()
 
         self.manipulator_moved = False
         rect = self.manipulator.rect
@@ -84,11 +94,8 @@ class ShapeEditArea(QtWidgets.QWidget):
             self.transform.set_rect(rect)
             self.transform.reference_rect = QtCore.QRectF(rect)
 
-        self.clicked_shape = None
-        for shape in reversed(self.shapes):
-            if shape.rect.contains(cursor):
-                self.clicked_shape = shape
-                break
+        shapes = self.index.at_point(cursor)
+        self.clicked_shape = shapes[-1] if shapes else None
 
         if rect and rect.contains(cursor):
             self.transform.set_reference_point(cursor)
@@ -102,7 +109,11 @@ class ShapeEditArea(QtWidgets.QWidget):
 
     def mouseReleaseEvent(self, _):
         if self.edit_center_mode is True:
+            if self.increase_undo_on_release:
+                self.increaseUndoStackRequested.emit()
+                self.increase_undo_on_release = False
             self.clicked = False
+            self.gestureFinished.emit()
             return
 
         shape = self.clicked_shape
@@ -115,9 +126,7 @@ class ShapeEditArea(QtWidgets.QWidget):
             self.update_selection()
 
         if self.selection_square.handling:
-            shapes = [
-                    s for s in self.shapes
-                    if s.rect.intersects(self.selection_square.rect)]
+            shapes = self.index.intersecting(self.selection_square.rect)
             if shapes:
                 self.selection.set(shapes)
                 rects = [shape.rect for shape in self.selection]
@@ -131,6 +140,7 @@ class ShapeEditArea(QtWidgets.QWidget):
 
         self.clicked = False
         self.handeling = False
+        self.gestureFinished.emit()
         self.repaint()
 
     def keyPressEvent(self, event):
@@ -161,6 +171,14 @@ class ShapeEditArea(QtWidgets.QWidget):
 
         self.repaint()
 
+    def update_index(self):
+        """
+        rebuild the shapes spatial index, has to be called when shapes are
+        added, removed or reordered.
+        """
+        self.index.build(self.shapes)
+        self.hovered_shapes = [s for s in self.hovered_shapes if s in self.index]
+
     def update_selection(self):
         rects = [shape.rect for shape in self.selection]
         self.manipulator.set_rect(get_combined_rects(rects))
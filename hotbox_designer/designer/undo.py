@@ -0,0 +1,291 @@
+# coding=utf-8
+import sys
+import time
+
+UNDO_STACK_DEPTH = 200
+UNDO_MEMORY_LIMIT = 16 * 1024 * 1024  # approximative size in bytes
+UNDO_MERGE_DELAY = 1.0  # seconds
+# marker for an option which doesn't exist in one of the compared states
+MISSING = object()
+
+
+class UndoManager:
+    """
+    Delta based undo stack. It keeps one snapshot of the last recorded
+    state and each step only stores the differences with the previous one:
+    the general options modified, the shape options modified and the shapes
+    list order if shapes were added, removed or reordered.
+    Shapes are identified by their options dict, undo and redo return a
+    patch that the editor apply on its existing shapes.
+    A step is a dict {'general': {}, 'shapes': {}, 'order': None} where the
+    values are (before, after) tuples and 'shapes' is keyed by options id.
+    Continuous edits can be merged in one step, either explicitly with
+    begin/commit around a gesture, or by giving the same merge key to
+    modifications done within merge_delay seconds.
+    """
+    def __init__(
+            self, data, depth=UNDO_STACK_DEPTH,
+            memory_limit=UNDO_MEMORY_LIMIT, merge_delay=UNDO_MERGE_DELAY):
+        self.depth = depth
+        self.memory_limit = memory_limit
+        self.merge_delay = merge_delay
+        self._transaction_level = 0
+        self._transaction_recorded = False
+        self._merge_key = None
+        self._merge_time = 0
+        self._general = {}
+        self._shapes = []
+        self._snapshots = {}
+        self._modified = False
+        self._undo_stack = []
+        self._redo_stack = []
+        self._take_snapshot(data)
+
+    @property
+    def data(self):
+        return {
+            'general': self._general.copy(),
+            'shapes': [self._snapshots[id(s)].copy() for s in self._shapes]}
+
+    @property
+    def memory_size(self):
+        return sum(step['size'] for step in self._undo_stack + self._redo_stack)
+
+    def undo(self):
+        if not self._undo_stack:
+            print('no undo stack')
+            return None
+        step = self._undo_stack.pop()
+        self._redo_stack.append(step)
+        self._merge_key = None
+        patch = get_patch(step, before=True)
+        self._apply_patch(patch)
+        return patch
+
+    def redo(self):
+        if not self._redo_stack:
+            return None
+
+        step = self._redo_stack.pop()
+        self._undo_stack.append(step)
+        self._merge_key = None
+        patch = get_patch(step, before=False)
+        self._apply_patch(patch)
+        return patch
+
+    @property
+    def in_transaction(self):
+        return self._transaction_level > 0
+
+    def begin(self):
+        """
+        open a transaction, all the modifications recorded until the commit
+        are merged in one undo step. Transactions can be nested.
+        """
+        if self._transaction_level == 0:
+            self._transaction_recorded = False
+        self._transaction_level += 1
+
+    def commit(self):
+        """
+        close the transaction and return True if something was recorded.
+        """
+        if not self._transaction_level:
+            return False
+        self._transaction_level -= 1
+        return not self._transaction_level and self._transaction_recorded
+
+    def set_data_modified(self, data, merge_key=None):
+        """
+        record the modifications and return True if something changed.
+        The step is merged with the previous one if it is part of the same
+        transaction or if both share the same merge key and were done in
+        the merge delay.
+        """
+        step = self._diff(data)
+        if step is None:
+            return False
+        self._redo_stack = []
+        self._take_snapshot(data, step)
+        now = time.time()
+        merge = (
+            self.in_transaction and self._transaction_recorded or
+            merge_key is not None and merge_key == self._merge_key and
+            now - self._merge_time < self.merge_delay)
+        if merge and self._undo_stack:
+            step = merge_steps(self._undo_stack.pop(), step)
+        if step is not None:
+            self._undo_stack.append(step)
+        self._modified = True
+        # a step cancelled by the merge can't be merged with anymore
+        self._merge_key = merge_key if step is not None else None
+        self._merge_time = now
+        if self.in_transaction:
+            self._transaction_recorded = step is not None
+        self._trim()
+        return True
+
+    def set_data_saved(self):
+        self._modified = False
+
+    @property
+    def data_saved(self):
+        return not self._modified
+
+    def reset_stacks(self):
+        self._undo_stack = []
+        self._redo_stack = []
+
+    def _diff(self, data):
+        general = get_options_differences(self._general, data['general'])
+        shapes = {}
+        for options in data['shapes']:
+            snapshot = self._snapshots.get(id(options))
+            if snapshot is None:
+                continue
+            differences = get_options_differences(snapshot, options)
+            if differences:
+                shapes[id(options)] = options, differences
+        order = None
+        if [id(s) for s in self._shapes] != [id(s) for s in data['shapes']]:
+            order = self._shapes, list(data['shapes'])
+        if not general and not shapes and order is None:
+            return None
+        step = {'general': general, 'shapes': shapes, 'order': order}
+        step['size'] = get_step_size(step)
+        return step
+
+    def _take_snapshot(self, data, step=None):
+        """
+        update the snapshot with the given data. If the step recorded is
+        given, only the shapes modified or added are copied.
+        """
+        self._general = data['general'].copy()
+        shapes = list(data['shapes'])
+        if step is None:
+            self._snapshots = {id(s): s.copy() for s in shapes}
+        else:
+            snapshots = {}
+            for options in shapes:
+                identifier = id(options)
+                snapshot = self._snapshots.get(identifier)
+                if snapshot is None or identifier in step['shapes']:
+                    snapshot = options.copy()
+                snapshots[identifier] = snapshot
+            self._snapshots = snapshots
+        self._shapes = shapes
+
+    def _apply_patch(self, patch):
+        apply_values(self._general, patch['general'])
+        if patch['order'] is not None:
+            self._shapes = list(patch['order'])
+        snapshots = {}
+        for options in self._shapes:
+            snapshot = self._snapshots.get(id(options))
+            if snapshot is None:
+                snapshot = options.copy()
+            snapshots[id(options)] = snapshot
+        for identifier, (_, values) in patch['shapes'].items():
+            if identifier in snapshots:
+                apply_values(snapshots[identifier], values)
+        self._snapshots = snapshots
+
+    def _trim(self):
+        while len(self._undo_stack) > self.depth:
+            self._undo_stack.pop(0)
+        while self._undo_stack and self.memory_size > self.memory_limit:
+            self._undo_stack.pop(0)
+
+
+def get_options_differences(before, after):
+    keys = set(before) | set(after)
+    return {
+        key: (before.get(key, MISSING), after.get(key, MISSING))
+        for key in keys
+        if before.get(key, MISSING) != after.get(key, MISSING)}
+
+
+def merge_steps(first, second):
+    """
+    return a step going from the state before the first to the state after
+    the second, or None if the second step reverts the first one.
+    """
+    general = merge_differences(first['general'], second['general'])
+    shapes = {}
+    for identifier in set(first['shapes']) | set(second['shapes']):
+        options = (first['shapes'].get(identifier) or
+                   second['shapes'].get(identifier))[0]
+        differences = merge_differences(
+            first['shapes'].get(identifier, (None, {}))[1],
+            second['shapes'].get(identifier, (None, {}))[1])
+        if differences:
+            shapes[identifier] = options, differences
+    order = None
+    if first['order'] is not None or second['order'] is not None:
+        before = (first['order'] or second['order'])[0]
+        after = (second['order'] or first['order'])[1]
+        if [id(s) for s in before] != [id(s) for s in after]:
+            order = before, after
+    if not general and not shapes and order is None:
+        return None
+    step = {'general': general, 'shapes': shapes, 'order': order}
+    step['size'] = get_step_size(step)
+    return step
+
+
+def merge_differences(first, second):
+    differences = dict(first)
+    for key, (before, after) in second.items():
+        if key in differences:
+            before = differences[key][0]
+        differences[key] = before, after
+    return {
+        key: values for key, values in differences.items()
+        if values[0] != values[1]}
+
+
+def get_patch(step, before=True):
+    """
+    return the values to set to go to the state before or after the step.
+    {'general': {key: value}, 'shapes': {id: (options, {key: value})},
+    'order': [options, ...] or None}
+    """
+    index = 0 if before else 1
+    order = step['order'][index] if step['order'] is not None else None
+    return {
+        'general': {k: v[index] for k, v in step['general'].items()},
+        'shapes': {
+            identifier: (options, {k: v[index] for k, v in values.items()})
+            for identifier, (options, values) in step['shapes'].items()},
+        'order': order}
+
+
+def apply_values(options, values):
+    for key, value in values.items():
+        if value is MISSING:
+            options.pop(key, None)
+        else:
+            options[key] = value
+
+
+def get_step_size(step):
+    """
+    approximative memory size of an undo step. The options of the shapes
+    added or removed are counted cause the step keeps them alive.
+    """
+    size = 0
+    values = list(step['general'].values())
+    for _, differences in step['shapes'].values():
+        values.extend(differences.values())
+    for before, after in values:
+        size += sys.getsizeof(before) + sys.getsizeof(after)
+    if step['order'] is not None:
+        before, after = step['order']
+        size += sys.getsizeof(before) + sys.getsizeof(after)
+        identifiers = set(id(s) for s in after)
+        for options in before:
+            if id(options) in identifiers:
+                continue
+            size += sys.getsizeof(options)
+            size += sum(sys.getsizeof(v) for v in options.values())
+    return size
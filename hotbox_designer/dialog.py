@@ -3,9 +3,18 @@ import os
 import json
 from PySide2 import QtWidgets
 from hotbox_designer.data import (get_new_hotbox, get_valid_name, copy_hotbox_data,
-                                  load_templates, ensure_old_data_compatible)
+                                  load_templates, read_hotbox_data, compact_hotbox_data)
 from hotbox_designer.widgets import TouchEdit, BoolCombo
 
+STATS_TABLE = """
+<b>{title}</b>
+<table cellspacing="4">
+<tr><th>Shape</th><th>Language</th><th>Count</th><th>Mean (ms)</th><th>Max (ms)</th></tr>
+{rows}
+</table><br>
+"""
+STATS_ROW = """<tr><td>{shape}</td><td>{language}</td><td>{count}</td><td>{mean:.2f}</td><td>{max:.2f}</td></tr>"""
+
 
 def warning(title, message, parent=None):
     return QtWidgets.QMessageBox.warning(parent, title, message, QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
@@ -20,7 +29,7 @@ def import_hotbox():
         return
 
     with open(filenames[0], 'r') as f:
-        return ensure_old_data_compatible(json.load(f))
+        return read_hotbox_data(json.load(f))
 
 
 def import_hotbox_link():
@@ -47,7 +56,7 @@ def export_hotbox(hotbox):
         filename += '.json'
 
     with open(filename, 'w') as f:
-        json.dump(hotbox, f, indent=2)
+        json.dump(compact_hotbox_data(hotbox), f, indent=2)
 
 
 class CreateHotboxDialog(QtWidgets.QDialog):
@@ -133,6 +142,41 @@ class CommandDisplayDialog(QtWidgets.QDialog):
         self.layout.addLayout(self.button_layout)
 
 
+class HotboxStatsDialog(QtWidgets.QDialog):
+    def __init__(self, telemetry, hotbox_name, parent=None):
+        super(HotboxStatsDialog, self).__init__(parent)
+        self.setWindowTitle("Stats: " + hotbox_name)
+        self.text = QtWidgets.QTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setHtml(
+            actions_stats_to_html(
+                'Slowest actions', telemetry.slowest(hotbox=hotbox_name)) +
+            actions_stats_to_html(
+                'Most used actions', telemetry.most_used(hotbox=hotbox_name)))
+        self.ok = QtWidgets.QPushButton('ok')
+        self.ok.released.connect(self.accept)
+
+        self.button_layout = QtWidgets.QHBoxLayout()
+        self.button_layout.setContentsMargins(0, 0, 0, 0)
+        self.button_layout.addStretch(1)
+        self.button_layout.addWidget(self.ok)
+
+        self.layout = QtWidgets.QVBoxLayout(self)
+        self.layout.addWidget(self.text)
+        self.layout.addLayout(self.button_layout)
+
+
+def actions_stats_to_html(title, stats):
+    rows = ''.join(
+        STATS_ROW.format(
+            shape=stat['shape'] or '...', language=stat['language'],
+            count=stat['count'], mean=stat['mean'], max=stat['max'])
+        for stat in stats)
+    if not rows:
+        rows = '<tr><td colspan="5">no action recorded</td></tr>'
+    return STATS_TABLE.format(title=title, rows=rows)
+
+
 class HotkeySetter(QtWidgets.QDialog):
     def __init__(self, modes, parent=None):
         super(HotkeySetter, self).__init__(parent)
@@ -1,10 +1,20 @@
 # coding=utf-8
-from PySide2 import QtCore, QtGui
+from PySide2 import QtCore
 from hotbox_designer.geometry import (DIRECTIONS, get_topleft_rect, get_bottomleft_rect, get_topright_rect,
                                       get_bottomright_rect, get_left_side_rect, get_right_side_rect,
-                                      get_top_side_rect, get_bottom_side_rect, proportional_rect)
-from hotbox_designer.painting import draw_selection_square, draw_manipulator, get_hovered_path, draw_shape
-from hotbox_designer.languages import execute_code
+                                      get_top_side_rect, get_bottom_side_rect, proportional_rect, grow_rect)
+from hotbox_designer.painting import (draw_selection_square, draw_manipulator, get_hovered_path, draw_shape,
+                                      render_shape_tile, get_shape_state, get_pen, get_brush, get_font,
+                                      create_text_layout)
+from hotbox_designer.languages import execute_code, precompile_code
+from hotbox_designer.qtutils import get_pixmap, VALIGNS, HALIGNS
+
+# the options names of the states, in the painting state indexes order
+STATES = 'normal', 'hovered', 'clicked'
+SIDES = 'left', 'right'
+LEFT, RIGHT = 0, 1
+# prefixes of the options decoded by Shape.decode_style
+STYLE_OPTIONS = 'border', 'bordercolor', 'borderwidth', 'bgcolor'
 
 
 class SelectionSquare:
@@ -96,16 +106,123 @@ def get_shape_rect_from_options(options):
             options['shape.height'])
 
 
-class Shape:
+class Shape(object):
+    """
+    Runtime representation of a shape. The options dict stays the shape
+    data saved, the values used while painting, hovering and clicking are
+    decoded once in typed fields. Modify the options with set_option, or
+    call decode_options after the dict was edited directly, to keep them
+    synchronized.
+    """
+    __slots__ = (
+        'hovered', 'clicked', 'options', 'rect', 'round', 'pixmap',
+        'image_rect', 'tile_rect', '_tiles', 'styles', 'textpen',
+        'textbrush', 'text', 'text_flags', 'font', '_text_layout',
+        'actions', 'closes', 'interactive')
+
     def __init__(self, options):
         self.hovered = False
         self.clicked = False
         self.options = options
-        self.rect = get_shape_rect_from_options(options)
         self.pixmap = None
         self.image_rect = None
+        self.tile_rect = None
+        self._tiles = {}
+        self.decode_options()
+
+    def decode_options(self):
+        self.decode_geometry()
+        self.decode_style()
+        self.decode_text()
+        self.decode_actions()
         self.synchronize_image()
 
+    def set_option(self, option, value):
+        """
+        set the option value and decode only the fields depending on it.
+        """
+        self.options[option] = value
+        prefix = option.split('.')[0]
+        if prefix == 'shape':
+            self.decode_geometry()
+            self.synchronize_image_rect()
+        elif prefix in STYLE_OPTIONS:
+            self.decode_style()
+        elif prefix == 'text':
+            self.decode_text()
+        elif prefix == 'action':
+            self.decode_actions()
+        elif prefix == 'image':
+            self.synchronize_image()
+        self.invalidate_tiles()
+
+    def decode_geometry(self):
+        self.rect = get_shape_rect_from_options(self.options)
+        self.round = self.options['shape'] == 'round'
+
+    def decode_style(self):
+        """
+        the styles are a tuple of (pen, brush, borderwidth) indexed by the
+        painting state. The pens and brushes are interned, the shapes with
+        the same style share them.
+        """
+        options = self.options
+        alpha = options['bordercolor.transparency'] if options['border'] else 255
+        bgalpha = 255 - options['bgcolor.transparency']
+        styles = []
+        for state in STATES:
+            borderwidth = float(options['borderwidth.' + state])
+            pen = get_pen(
+                options['bordercolor.' + state], 255 - alpha, borderwidth)
+            brush = get_brush(options['bgcolor.' + state], bgalpha)
+            styles.append((pen, brush, borderwidth))
+        self.styles = tuple(styles)
+
+    def decode_text(self):
+        options = self.options
+        self.textpen = get_pen(options['text.color'])
+        self.textbrush = get_brush(options['text.color'])
+        self.text = options['text.content']
+        self.text_flags = (
+            VALIGNS[options['text.valign']] | HALIGNS[options['text.halign']])
+        self.font = get_font(
+            options['text.bold'], options['text.italic'], options['text.size'])
+        self._text_layout = None
+
+    def get_text_layout(self, rect):
+        """
+        return the text laid out in the content rect, or None if it
+        overflows, see painting.create_text_layout. It is kept until the
+        rect size or the text options change.
+        """
+        size = rect.width(), rect.height()
+        if self._text_layout is None or self._text_layout[0] != size:
+            layout = create_text_layout(
+                self.text, self.font, self.text_flags, *size)
+            self._text_layout = size, layout
+        return self._text_layout[1]
+
+    def decode_actions(self):
+        """
+        the actions are a tuple indexed by side (LEFT, RIGHT) of
+        (language, command, mode) tuples, None if the side has no action.
+        The closes are the autoclose flags indexed the same way.
+        """
+        options = self.options
+        actions = []
+        for side in SIDES:
+            if not options['action.' + side]:
+                actions.append(None)
+                continue
+            actions.append((
+                options['action.{}.language'.format(side)],
+                options['action.{}.command'.format(side)],
+                options['action.{}.mode'.format(side)]))
+        self.actions = tuple(actions)
+        self.closes = tuple(
+            options['action.{}.close'.format(side)] for side in SIDES)
+        self.interactive = any(self.actions)
+
     def set_hovered(self, cursor):
         self.hovered = self.rect.contains(cursor)
 
@@ -119,6 +236,42 @@ class Shape:
     def draw(self, painter):
         draw_shape(painter, self)
 
+    def draw_cached(self, painter):
+        """
+        draw the shape using a pixmap pre-rendered per state. The tiles are
+        rendered on first use and kept until invalidate_tiles is called.
+        """
+        ratio = painter.device().devicePixelRatioF()
+        key = get_shape_state(self), ratio
+        tile = self._tiles.get(key)
+        if tile is None:
+            rect = self.paint_rect()
+            tile = render_shape_tile(self, key[0], rect, ratio)
+            self._tiles[key] = tile
+        painter.drawPixmap(self.tile_rect.topLeft(), tile)
+
+    def paint_rect(self):
+        """
+        return the rect covered by the shape once painted, border and
+        image included.
+        """
+        if self.tile_rect is None:
+            self.tile_rect = self.get_tile_rect()
+        return self.tile_rect
+
+    def get_tile_rect(self):
+        bordersize = max(style[2] for style in self.styles)
+        # the pen is centered on the shape outline, half of it is drawn
+        # outside the rect. One more pixel covers the antialiasing.
+        rect = grow_rect(self.rect, (bordersize / 2.0) + 1).toAlignedRect()
+        if self.image_rect is not None:
+            rect = rect.united(self.image_rect)
+        return rect
+
+    def invalidate_tiles(self):
+        self.tile_rect = None
+        self._tiles = {}
+
     def synchronize_rect(self):
         self.options['shape.left'] = self.rect.left()
         self.options['shape.top'] = self.rect.top()
@@ -126,34 +279,44 @@ class Shape:
         self.options['shape.height'] = self.rect.height()
 
     def content_rect(self):
-        if self.options['shape'] == 'round':
+        if self.round:
             return proportional_rect(self.rect.toRect(), 70)
         return self.rect.toRect()
 
-    def execute(self, left=False, right=False):
-        side = 'left' if left else 'right' if right else None
-        if not side or not self.options['action.' + side]:
+    def get_action(self, left=False, right=False):
+        side = LEFT if left else RIGHT if right else None
+        return None if side is None else self.actions[side]
+
+    def execute(self, left=False, right=False, hotbox=None):
+        action = self.get_action(left=left, right=right)
+        if action is None:
             return
-        code = self.options['action.{}.command'.format(side)]
-        language = self.options['action.{}.language'.format(side)]
-        execute_code(language, code)
+        execute_code(*action, hotbox=hotbox, label=self.text)
 
     def is_interactive(self):
-        return any([self.options['action.right'], self.options['action.left']])
+        return self.interactive
+
+    def precompile(self):
+        for action in self.actions:
+            if action is not None:
+                precompile_code(action[0], action[1])
 
     def autoclose(self, left=False, right=False):
-        if left is True and right is False:
-            return self.options['action.left.close']
-        elif left is False and right is True:
-            return self.options['action.right.close']
-        elif left is True and right is True:
-            r_close = self.options['action.right.close']
-            l_close = self.options['action.left.close']
-            return r_close or l_close
-        return False
+        return bool(
+            left is True and self.closes[LEFT] or
+            right is True and self.closes[RIGHT])
 
     def synchronize_image(self):
-        self.pixmap = QtGui.QPixmap(self.options['image.path'])
+        """
+        reload the pixmap from the image path and update the image rect.
+        Use it when the image options changed. For geometry only changes,
+        synchronize_image_rect is enough and doesn't touch the filesystem.
+        """
+        self.pixmap = get_pixmap(self.options['image.path'])
+        self.synchronize_image_rect()
+
+    def synchronize_image_rect(self):
+        self.invalidate_tiles()
         if self.options['image.fit'] is True:
             self.image_rect = None
             return
@@ -1,22 +1,117 @@
 # coding=utf-8
+import time
+import logging
+import threading
+from functools import partial
+from collections import OrderedDict
+from PySide2 import QtCore
+from hotbox_designer import telemetry
+
 PYTHON = 'python'
 MEL = 'mel'
 NUKE_TCL = 'nuke tcl'
 NUKE_EXPRESSION = 'nuke expression'
 HSCRIPT = 'houdini script'
+INLINE = 'inline'
+DEFERRED = 'deferred'
+THREAD = 'thread'
+EXECUTION_MODES = INLINE, DEFERRED, THREAD
+COMPILE_CACHE_SIZE = 512
+_compiled_codes = OrderedDict()
+logger = logging.getLogger('hotbox_designer')
+
+
+def execute_code(language, code, mode=INLINE, hotbox=None, label=None):
+    """
+    execute the code with the given mode:
+        inline: immediately, the errors are raised to the caller.
+        deferred: at the next event loop iteration, after the hotbox closed.
+        thread: in a worker thread. Only the python code is supposed to be
+            thread safe, the other languages fall back on the deferred mode.
+    The deferred and thread executions log their result and their errors,
+    and record their duration in the telemetry with the given hotbox and
+    label. The inline executions are timed by the caller.
+    """
+    executor = EXECUTORS[language]
+    compiled = get_compiled_code(language, code)
+    if mode == INLINE:
+        return executor(compiled)
+    function = partial(
+        execute_logged, executor, compiled, language, mode, hotbox, label)
+    if mode == THREAD and language == PYTHON:
+        thread = threading.Thread(target=function)
+        thread.daemon = True
+        thread.start()
+        return
+    QtCore.QTimer.singleShot(0, function)
+
+
+def execute_logged(executor, code, language, mode, hotbox=None, label=None):
+    start = time.time()
+    try:
+        executor(code)
+    except Exception:
+        logger.exception('%s command failed (%s mode)', language, mode)
+        return
+    duration = time.time() - start
+    telemetry.record(
+        telemetry.EXECUTE, duration, hotbox=hotbox, shape=label,
+        language=language)
+    logger.info(
+        '%s command executed in %.1fms (%s mode)',
+        language, duration * 1000, mode)
+
+
+def get_compiled_code(language, code):
+    """
+    return the code ready to be executed: a code object for python and the
+    normalized source for the other languages. The results are kept in a
+    cache keyed by (language, code), a modified command is a new key.
+    """
+    key = language, code
+    compiled = _compiled_codes.pop(key, None)
+    if compiled is None:
+        compiled = COMPILERS.get(language, str_code)(code)
+        if len(_compiled_codes) >= COMPILE_CACHE_SIZE:
+            _compiled_codes.popitem(last=False)
+    _compiled_codes[key] = compiled
+    return compiled
+
+
+def precompile_code(language, code):
+    """
+    populate the cache before the first execution. The syntax errors are
+    ignored here, they are raised when the command is executed.
+    """
+    try:
+        get_compiled_code(language, code)
+    except (SyntaxError, ValueError, TypeError):
+        pass
 
 
-def execute_code(language, code):
-    return EXECUTORS[language](code)
+def clear_compile_cache():
+    _compiled_codes.clear()
+
+
+def compile_python(code):
+    return compile(code, '<hotbox command>', 'exec')
+
+
+def normalize_mel(code):
+    return code.replace(u'\u2029', '\n')
+
+
+def str_code(code):
+    return code
 
 
 def execute_python(code):
-    exec code
+    exec(code)
 
 
 def execute_mel(code):
     from maya import mel
-    mel.eval(code.replace(u'\u2029', '\n'))
+    mel.eval(code)
 
 
 def execute_nuke_tcl(code):
@@ -34,6 +129,12 @@ def execute_hscript(code):
     hou.hscript(code)
 
 
+COMPILERS = {
+        PYTHON: compile_python,
+        MEL: normalize_mel
+        }
+
+
 EXECUTORS = {
         PYTHON: execute_python,
         MEL: execute_mel,
@@ -1,4 +1,5 @@
 # coding=utf-8
+import atexit
 import json
 import os
 from functools import partial
@@ -6,70 +7,193 @@ from PySide2 import QtWidgets, QtCore
 import hotbox_designer
 from hotbox_designer.commands import OPEN_COMMAND, CLOSE_COMMAND, SWITCH_COMMAND
 from hotbox_designer.reader import HotboxReader
+from hotbox_designer.registry import HotboxRegistry
+from hotbox_designer import telemetry
 from hotbox_designer.designer.application import HotboxEditor
-from hotbox_designer.applications import Nuke, Maya, Houdini
+from hotbox_designer.applications import Nuke, Maya, Houdini, Standalone
 from hotbox_designer.widgets import BoolCombo, Title, CommandButton
 from hotbox_designer.qtutils import icon
 from hotbox_designer.dialog import (import_hotbox, export_hotbox, import_hotbox_link, CreateHotboxDialog,
-                                    CommandDisplayDialog, HotkeySetter, warning)
-from hotbox_designer.data import (get_valid_name, TRIGGERING_TYPES, save_datas, load_hotboxes_datas,
-                                  hotbox_data_to_html, load_json, ensure_old_data_compatible)
+                                    CommandDisplayDialog, HotkeySetter, HotboxStatsDialog, warning)
+from hotbox_designer.data import (get_valid_name, TRIGGERING_TYPES, load_hotboxes_datas, copy_hotbox_data, save_datas,
+                                  save_hotboxes_datas, hotbox_data_to_html, load_json, load_hotboxes_links,
+                                  load_hotbox_link)
+from hotbox_designer.saving import SaveScheduler
+from hotbox_designer.rendering import RENDERERS
+from hotbox_designer.watcher import HotboxFilesWatcher
 
 
-hotboxes = {}
 hotbox_manager = None
-APPLICATIONS = {'maya': Maya, 'nuke': Nuke, 'houdini': Houdini}
+usage_file = None
+watcher = None
+# count of most used hotboxes readers built in background after loading
+PREWARM_COUNT = 5
+APPLICATIONS = {
+    'maya': Maya, 'nuke': Nuke, 'houdini': Houdini, 'standalone': Standalone}
 
 
 def launch_manager(application):
+    global hotbox_manager
     if hotbox_manager is None:
-        global hotbox_manager
         hotbox_manager = HotboxManager(APPLICATIONS[application]())
     hotbox_manager.show()
 
 
+def create_reader(hotbox_data):
+    reader = HotboxReader(hotbox_data, parent=None)
+    reader.hideSubmenusRequested.connect(hide_submenus)
+    return reader
+
+
+hotboxes = HotboxRegistry(create_reader)
+
+
 def initialize(application):
-    if hotboxes:
+    if hotboxes.loaded:
         return
     load_hotboxes(application)
 
 
 def load_hotboxes(application):
-    hotboxes_datas = load_hotboxes_datas(application.local_file)
-    file_ = application.shared_file
-    hotboxes_datas += [
-        ensure_old_data_compatible(load_json(f)) for f in load_json(file_)]
-
-    for hotboxes_data in hotboxes_datas:
-        name = hotboxes_data['general']['name']
-        reader = HotboxReader(hotboxes_data, parent=None)
-        reader.hideSubmenusRequested.connect(hide_submenus)
-        hotboxes[name] = reader
+    global usage_file
+    if hotbox_manager is not None:
+        # the files can't be read while a save is pending
+        hotbox_manager.save_scheduler.flush()
+    hotboxes_datas = load_hotboxes_datas(
+        application.local_file, rewrite_migrated=True)
+    sources = [application.local_file] * len(hotboxes_datas)
+    links = load_json(application.shared_file, default=[])
+    shared_datas, errors = load_hotboxes_links(
+        links, cache_folder=application.cache_folder)
+    for link, error in errors:
+        print('impossible to load hotbox {}: {}'.format(link, error))
+    for link, data in zip(links, shared_datas):
+        if data is not None:
+            hotboxes_datas.append(data)
+            sources.append(link)
+    hotboxes.load(hotboxes_datas, sources)
+    initialize_telemetry(application)
+    watch_hotboxes_files(application, links)
+    if usage_file is None:
+        usage_file = application.usage_file
+        hotboxes.usage = load_json(usage_file, default={}) or {}
+    hotboxes.prewarm(PREWARM_COUNT)
+
+
+def initialize_telemetry(application):
+    if telemetry.is_requested() and telemetry.get_telemetry() is None:
+        telemetry.enable(application.telemetry_file)
+
+
+@atexit.register
+def save_usage():
+    if usage_file is None or not hotboxes.usage:
+        return
+    try:
+        save_datas(usage_file, hotboxes.usage)
+    except (IOError, OSError):
+        pass
+
+
+def watch_hotboxes_files(application, links):
+    global watcher
+    if watcher is None:
+        watcher = HotboxFilesWatcher()
+        method = partial(reload_hotboxes_files, application)
+        watcher.filesChanged.connect(method)
+    filenames = [application.local_file, application.shared_file]
+    watcher.set_files(filenames + list(links))
+
+
+def reload_hotboxes_files(application, filenames):
+    """
+    update the hotboxes coming from the files modified outside of this
+    session. Only the hotboxes which actually differ are updated. The files
+    written by the manager save scheduler are ignored by the watcher.
+    """
+    if not hotboxes.loaded:
+        return
+    if hotbox_manager is not None:
+        # the pending saves would be reverted by the reload
+        hotbox_manager.save_scheduler.flush()
+    links = load_json(application.shared_file, default=[]) or []
+    if application.local_file in filenames:
+        datas = load_hotboxes_datas(application.local_file)
+        update_source_hotboxes(application.local_file, datas)
+        if hotbox_manager is not None:
+            hotbox_manager.reload_personal_hotboxes(datas)
+
+    reloaded = {}
+    if application.shared_file in filenames:
+        local_sources = None, application.local_file
+        for link in set(hotboxes.sources) - set(links):
+            if link not in local_sources:
+                update_source_hotboxes(link, [])
+        reloaded.update({
+            link: None for link in links if not hotboxes.get_names(link)})
+    reloaded.update({link: None for link in links if link in filenames})
+    changed_links = list(reloaded)
+    datas, errors = load_hotboxes_links(
+        changed_links, cache_folder=application.cache_folder)
+    for link, error in errors:
+        print('impossible to load hotbox {}: {}'.format(link, error))
+    for link, data in zip(changed_links, datas):
+        reloaded[link] = data
+        update_source_hotboxes(link, [data] if data is not None else [])
+    if hotbox_manager is not None:
+        hotbox_manager.reload_shared_hotboxes(links, reloaded)
+    watch_hotboxes_files(application, links)
+
+
+def update_source_hotboxes(source, hotboxes_datas):
+    names = [data['general']['name'] for data in hotboxes_datas]
+    for name in hotboxes.get_names(source):
+        if name not in names:
+            hotboxes.remove(name)
+    for hotbox_data in hotboxes_datas:
+        name = hotbox_data['general']['name']
+        if hotboxes.get_data(name) != hotbox_data:
+            hotboxes.set_hotbox(hotbox_data, source=source)
 
 
 def clear_loaded_hotboxes():
-    global hotboxes
-    hotboxes = {}
+    hotboxes.clear()
+
+
+def update_loaded_hotbox(hotbox_data, old_name=None, source=None):
+    """
+    drop the reader of an edited hotbox, it is rebuilt at the next show. If
+    the hotboxes are not loaded yet, there's nothing to update.
+    """
+    if hotboxes.loaded:
+        hotboxes.set_hotbox(hotbox_data, old_name=old_name, source=source)
+
+
+def remove_loaded_hotbox(name):
+    hotboxes.remove(name)
 
 
 def show(name):
+    hotboxes.record_usage(name)
     hotboxes[name].show()
 
 
 def hide(name):
-    hotboxes[name].hide()
+    # a reader never built can't be visible
+    if hotboxes.is_built(name):
+        hotboxes[name].hide()
 
 
 def switch(name):
-    if hotboxes[name].isVisible():
+    if hotboxes.is_built(name) and hotboxes[name].isVisible():
         return hide(name)
     return show(name)
 
 
 def hide_submenus():
-    for name in hotboxes:
-        if hotboxes[name].is_submenu:
-            hide(name)
+    for reader in hotboxes.readers:
+        if reader.is_submenu:
+            reader.hide()
 
 
 class HotboxManager(QtWidgets.QWidget):
@@ -79,8 +203,14 @@ class HotboxManager(QtWidgets.QWidget):
         self.setWindowTitle('Hotbox Designer')
         self.application = application
         self.hotbox_designer = None
-
-        hotboxes_data = load_hotboxes_datas(self.application.local_file)
+        initialize_telemetry(application)
+        self.save_scheduler = SaveScheduler(parent=self)
+        self.save_scheduler.saveFailed.connect(self._save_failed)
+        app = QtWidgets.QApplication.instance()
+        app.aboutToQuit.connect(self.save_scheduler.flush)
+
+        hotboxes_data = load_hotboxes_datas(
+            self.application.local_file, rewrite_migrated=True)
         self.personnal_model = HotboxPersonalTableModel(hotboxes_data)
         self.personnal_view = HotboxTableView()
         self.personnal_view.set_model(self.personnal_model)
@@ -98,6 +228,7 @@ class HotboxManager(QtWidgets.QWidget):
         self.toolbar.importRequested.connect(self._call_import)
         self.toolbar.exportRequested.connect(self._call_export)
         self.toolbar.setHotkeyRequested.connect(self._call_set_hotkey)
+        self.toolbar.statsRequested.connect(self._call_stats)
         setter_enabled = bool(application.available_set_hotkey_modes)
         self.toolbar.hotkeyset.setEnabled(setter_enabled)
 
@@ -122,7 +253,12 @@ class HotboxManager(QtWidgets.QWidget):
         self.hlayout.addWidget(self.edit)
 
         links = load_json(application.shared_file, default=[])
-        self.shared_model = HotboxSharedTableModel(links)
+        self.shared_model = HotboxSharedTableModel(
+            links, cache_folder=application.cache_folder)
+        if self.shared_model.errors:
+            message = '\n'.join(
+                '{}: {}'.format(*error) for error in self.shared_model.errors)
+            warning('Hotbox designer', 'Impossible to load:\n' + message)
         self.shared_view = HotboxTableView()
         self.shared_view.set_model(self.shared_model)
         method = self._shared_selected_row_changed
@@ -168,9 +304,57 @@ class HotboxManager(QtWidgets.QWidget):
         return model.hotboxes[row]
 
     def save_hotboxes(self, *_):
-        save_datas(self.application.local_file, self.personnal_model.hotboxes)
-        datas = self.shared_model.hotboxes_links
-        save_datas(self.application.shared_file, datas)
+        personnal_model = self.personnal_model
+        self.save_scheduler.schedule(
+            self.application.local_file,
+            lambda: [copy_hotbox_data(h) for h in personnal_model.hotboxes],
+            writer=save_hotboxes_datas)
+        shared_model = self.shared_model
+        self.save_scheduler.schedule(
+            self.application.shared_file,
+            lambda: list(shared_model.hotboxes_links))
+
+    def reload_personal_hotboxes(self, hotboxes_data):
+        if self.personnal_model.hotboxes == hotboxes_data:
+            return
+        row = self.personnal_view.get_selected_row()
+        self.personnal_model.layoutAboutToBeChanged.emit()
+        self.personnal_model.hotboxes[:] = hotboxes_data
+        self.personnal_model.layoutChanged.emit()
+        if row is not None and row < len(hotboxes_data):
+            self.personnal_view.selectRow(row)
+        self._personnal_selected_row_changed()
+
+    def reload_shared_hotboxes(self, links, reloaded):
+        """
+        update the shared table with the current links. reloaded is a dict
+        {link: hotbox_data} of the links files read again, hotbox_data is
+        None if the file failed to load. The table keeps a row by link, the
+        None hotboxes must be skipped by the callers using the hotboxes data.
+        """
+        model = self.shared_model
+        if model.hotboxes_links == links and not reloaded:
+            return
+        loaded = dict(zip(model.hotboxes_links, model.hotboxes))
+        loaded.update(reloaded)
+        hotboxes_ = []
+        for link in links:
+            if link not in loaded:
+                loaded[link] = load_hotbox_link(link, model.cache_folder)[0]
+            hotboxes_.append(loaded[link])
+        if model.hotboxes_links == links and model.hotboxes == hotboxes_:
+            return
+        model.layoutAboutToBeChanged.emit()
+        model.hotboxes_links[:] = links
+        model.hotboxes[:] = hotboxes_
+        model.layoutChanged.emit()
+
+    def _save_failed(self, filename, error):
+        warning('Hotbox designer', 'Impossible to save {}\n{}'.format(filename, error))
+
+    def closeEvent(self, event):
+        self.save_scheduler.flush()
+        return super(HotboxManager, self).closeEvent(event)
 
     def _personnal_selected_row_changed(self):
         hotbox = self.get_selected_hotbox()
@@ -189,8 +373,10 @@ class HotboxManager(QtWidgets.QWidget):
 
     def hotbox_data_modified(self, hotbox_data):
         row = self.personnal_view.get_selected_row()
+        old_name = self.personnal_model.hotboxes[row]['general']['name']
         self.personnal_model.set_hotbox(row, hotbox_data)
-        clear_loaded_hotboxes()
+        update_loaded_hotbox(
+            hotbox_data, old_name=old_name, source=self.application.local_file)
         self.save_hotboxes()
 
     def _shared_selected_row_changed(self):
@@ -262,7 +448,9 @@ class HotboxManager(QtWidgets.QWidget):
         self.hotbox_designer.show()
 
     def _call_create(self):
-        hotboxes_ = self.personnal_model.hotboxes + self.shared_model.hotboxes
+        # the shared links which failed to load have a None hotbox
+        shared = [h for h in self.shared_model.hotboxes if h is not None]
+        hotboxes_ = self.personnal_model.hotboxes + shared
         dialog = CreateHotboxDialog(hotboxes_, self)
         result = dialog.exec_()
         if result == QtWidgets.QDialog.Rejected:
@@ -277,7 +465,8 @@ class HotboxManager(QtWidgets.QWidget):
             self.personnal_view.selectRow(hotbox_count)
 
         self.save_hotboxes()
-        clear_loaded_hotboxes()
+        update_loaded_hotbox(
+            self.personnal_model.hotboxes[-1], source=self.application.local_file)
 
     def _call_add_link(self):
         filename = import_hotbox_link()
@@ -290,15 +479,19 @@ class HotboxManager(QtWidgets.QWidget):
         if hotbox_count > -1:
             self.shared_view.selectRow(hotbox_count)
         self.save_hotboxes()
-        clear_loaded_hotboxes()
+        hotbox = self.shared_model.hotboxes[-1]
+        if hotbox is not None:
+            update_loaded_hotbox(hotbox, source=filename)
 
     def _call_unlink(self):
         index = self.shared_view.get_selected_row()
         if index is None:
             return warning('Hotbox designer', 'No hotbox selected')
+        hotbox = self.shared_model.hotboxes[index]
         self.shared_model.remove_link(index)
         self.save_hotboxes()
-        clear_loaded_hotboxes()
+        if hotbox is not None:
+            remove_loaded_hotbox(hotbox['general']['name'])
 
     def _call_remove(self):
         hotbox = self.get_selected_hotbox()
@@ -319,7 +512,7 @@ class HotboxManager(QtWidgets.QWidget):
         self.personnal_model.hotboxes.remove(hotbox)
         self.personnal_model.layoutChanged.emit()
         self.save_hotboxes()
-        clear_loaded_hotboxes()
+        remove_loaded_hotbox(hotbox['general']['name'])
 
     def _call_option_set(self, option, value):
         self.personnal_model.layoutAboutToBeChanged.emit()
@@ -327,11 +520,15 @@ class HotboxManager(QtWidgets.QWidget):
         if option == 'name':
             value = get_valid_name(self.personnal_model.hotboxes, value)
 
-        if hotbox is not None:
-            hotbox['general'][option] = value
+        if hotbox is None:
+            self.personnal_model.layoutChanged.emit()
+            return
+        old_name = hotbox['general']['name']
+        hotbox['general'][option] = value
         self.personnal_model.layoutChanged.emit()
         self.save_hotboxes()
-        clear_loaded_hotboxes()
+        update_loaded_hotbox(
+            hotbox, old_name=old_name, source=self.application.local_file)
 
     def _call_set_hotkey(self):
         hotbox = self.get_selected_hotbox()
@@ -352,6 +549,17 @@ class HotboxManager(QtWidgets.QWidget):
         self.application.set_hotkey(name=name, mode=dialog.mode(), sequence=dialog.get_key_sequence(),
                                     open_cmd=open_cmd, close_cmd=CLOSE_COMMAND.format(name=name), switch_cmd=switch_cmd)
 
+    def _call_stats(self):
+        hotbox = self.get_selected_hotbox()
+        if not hotbox:
+            return warning('Hotbox designer', 'No hotbox selected')
+        telemetry_ = telemetry.get_telemetry()
+        if telemetry_ is None:
+            message = 'Telemetry is disabled, set {} environment variable to 1'
+            message = message.format(telemetry.TELEMETRY_ENVVAR)
+            return warning('Hotbox designer', message)
+        HotboxStatsDialog(telemetry_, hotbox['general']['name'], self).exec_()
+
     def _call_export(self):
         hotbox = self.get_selected_hotbox()
         if not hotbox:
@@ -370,7 +578,7 @@ class HotboxManager(QtWidgets.QWidget):
         self.personnal_model.hotboxes.append(hotbox)
         self.personnal_model.layoutChanged.emit()
         self.save_hotboxes()
-        clear_loaded_hotboxes()
+        update_loaded_hotbox(hotbox, source=self.application.local_file)
 
 
 class HotboxManagerToolbar(QtWidgets.QToolBar):
@@ -382,6 +590,7 @@ class HotboxManagerToolbar(QtWidgets.QToolBar):
     importRequested = QtCore.Signal()
     exportRequested = QtCore.Signal()
     setHotkeyRequested = QtCore.Signal()
+    statsRequested = QtCore.Signal()
 
     def __init__(self, parent=None):
         super(HotboxManagerToolbar, self).__init__(parent)
@@ -410,6 +619,9 @@ class HotboxManagerToolbar(QtWidgets.QToolBar):
         self.hotkeyset = QtWidgets.QAction(icon('touch.png'), '', self)
         self.hotkeyset.setToolTip('Set hotkey')
         self.hotkeyset.triggered.connect(self.setHotkeyRequested.emit)
+        self.stats = QtWidgets.QAction('stats', self)
+        self.stats.setToolTip('Show actions execution stats')
+        self.stats.triggered.connect(self.statsRequested.emit)
 
         self.addAction(self.new)
         self.addAction(self.edit)
@@ -422,6 +634,7 @@ class HotboxManagerToolbar(QtWidgets.QToolBar):
         self.addAction(self.export)
         self.addSeparator()
         self.addAction(self.hotkeyset)
+        self.addAction(self.stats)
 
 
 class HotboxTableView(QtWidgets.QTableView):
@@ -485,10 +698,12 @@ class HotboxPersonalTableModel(QtCore.QAbstractTableModel):
 
 class HotboxSharedTableModel(QtCore.QAbstractTableModel):
 
-    def __init__(self, hotboxes_links, parent=None):
+    def __init__(self, hotboxes_links, cache_folder=None, parent=None):
         super(HotboxSharedTableModel, self).__init__(parent=parent)
+        self.cache_folder = cache_folder
         self.hotboxes_links = hotboxes_links
-        self.hotboxes = [load_json(l) for l in hotboxes_links]
+        self.hotboxes, self.errors = load_hotboxes_links(
+            hotboxes_links, cache_folder=cache_folder)
 
     def columnCount(self, _):
         return 1
@@ -499,7 +714,8 @@ class HotboxSharedTableModel(QtCore.QAbstractTableModel):
     def add_link(self, hotbox_link):
         self.layoutAboutToBeChanged.emit()
         self.hotboxes_links.append(hotbox_link)
-        self.hotboxes.append(load_json(hotbox_link))
+        hotbox = load_hotbox_link(hotbox_link, self.cache_folder)[0]
+        self.hotboxes.append(hotbox)
         self.layoutChanged.emit()
 
     def remove_link(self, index):
@@ -562,6 +778,9 @@ class HotboxGeneralSettingWidget(QtWidgets.QWidget):
         self.leaveclose = BoolCombo(False)
         method = partial(self.optionSet.emit, 'leaveclose')
         self.leaveclose.valueSet.connect(method)
+        self.renderer = QtWidgets.QComboBox()
+        self.renderer.addItems(RENDERERS)
+        self.renderer.currentIndexChanged.connect(self._renderer_changed)
 
         self.open_command = CommandButton('show')
         self.close_command = CommandButton('hide')
@@ -579,6 +798,7 @@ class HotboxGeneralSettingWidget(QtWidgets.QWidget):
         self.layout.addRow('triggering', self.triggering)
         self.layout.addRow('aiming', self.aiming)
         self.layout.addRow('close on leave', self.leaveclose)
+        self.layout.addRow('renderer', self.renderer)
         self.layout.addItem(QtWidgets.QSpacerItem(0, 8))
         self.layout.addRow(Title('Commands'))
         self.layout.addItem(QtWidgets.QSpacerItem(0, 8))
@@ -589,6 +809,9 @@ class HotboxGeneralSettingWidget(QtWidgets.QWidget):
     def _triggering_changed(self, _):
         self.optionSet.emit('triggering', self.triggering.currentText())
 
+    def _renderer_changed(self, _):
+        self.optionSet.emit('renderer', self.renderer.currentText())
+
     def _touch_changed(self, _):
         self.optionSet.emit('touch', self.touch.text())
 
@@ -599,4 +822,5 @@ class HotboxGeneralSettingWidget(QtWidgets.QWidget):
         self.triggering.setCurrentText(hotbox_settings['triggering'])
         self.aiming.setCurrentText(str(hotbox_settings['aiming']))
         self.leaveclose.setCurrentText(str(hotbox_settings['leaveclose']))
+        self.renderer.setCurrentText(hotbox_settings['renderer'])
         self.blockSignals(False)
\ No newline at end of file
@@ -1,10 +1,22 @@
 # coding=utf-8
+import math
+from collections import OrderedDict
 from PySide2 import QtCore, QtGui
-from hotbox_designer.qtutils import VALIGNS, HALIGNS
 from hotbox_designer.geometry import grow_rect
 
 MANIPULATOR_BORDER = 5
 SELECTION_COLOR = '#3388FF'
+SNAP_COLOR = 'red'
+SNAP_TILE_SIZE = 256
+SNAP_TILES_CACHE_SIZE = 8
+AIMING_WIDTH = 3
+# shape states, they index the Shape.styles tuple
+NORMAL, HOVERED, CLICKED = 0, 1, 2
+INTERNING_CACHE_SIZE = 512
+# shared paint objects by kind and key, see get_interned.
+_interned = {}
+_interning_stats = {}
+_snap_tiles = OrderedDict()
 
 
 def draw_editor(painter, rect, snap=None):
@@ -19,17 +31,45 @@ def draw_editor(painter, rect, snap=None):
 
     if snap is None:
         return
-    # draw snap grid
-    pen = QtGui.QPen(QtGui.QColor('red'))
-    painter.setPen(pen)
-    x = 0
-    y = 0
-    while y < rect.bottom():
-        painter.drawPoint(x, y)
-        x += snap[0]
-        if x > rect.right():
-            x = 0
-            y += snap[1]
+    # draw snap grid, the tile covers several grid cells, see get_snap_tile
+    tile = get_snap_tile(int(snap[0]), int(snap[1]))
+    grid_rect = QtCore.QRect(0, 0, rect.right() + 1, rect.bottom())
+    painter.drawTiledPixmap(grid_rect, tile)
+
+
+def get_snap_tile(width, height):
+    """
+    return the snap grid tile for the given grid size. The tiles are kept in
+    their own small cache, the least recently used is dropped when
+    SNAP_TILES_CACHE_SIZE is reached.
+    """
+    key = width, height
+    tile = _snap_tiles.pop(key, None)
+    if tile is None:
+        tile = create_snap_tile(width, height)
+    _snap_tiles[key] = tile
+    while len(_snap_tiles) > SNAP_TILES_CACHE_SIZE:
+        _snap_tiles.popitem(last=False)
+    return tile
+
+
+def create_snap_tile(width, height):
+    """
+    the tile covers several grid cells, the tiny ones would make
+    drawTiledPixmap blit thousands of times.
+    """
+    columns = max(1, SNAP_TILE_SIZE // width)
+    rows = max(1, SNAP_TILE_SIZE // height)
+    tile = QtGui.QPixmap(width * columns, height * rows)
+    tile.fill(QtCore.Qt.transparent)
+    points = QtGui.QPolygon([
+        QtCore.QPoint(column * width, row * height)
+        for row in range(rows) for column in range(columns)])
+    painter = QtGui.QPainter(tile)
+    painter.setPen(QtGui.QPen(QtGui.QColor(SNAP_COLOR)))
+    painter.drawPoints(points)
+    painter.end()
+    return tile
 
 
 def draw_editor_center(painter, rect, point):
@@ -61,52 +101,168 @@ def get_center_path(point):
     return path
 
 
-def draw_shape(painter, shape):
-    options = shape.options
-    content_rect = shape.content_rect()
+def get_shape_state(shape):
     if shape.clicked:
-        bordercolor = QtGui.QColor(options['bordercolor.clicked'])
-        backgroundcolor = QtGui.QColor(options['bgcolor.clicked'])
-        bordersize = options['borderwidth.clicked']
+        return CLICKED
     elif shape.hovered:
-        bordercolor = QtGui.QColor(options['bordercolor.hovered'])
-        backgroundcolor = QtGui.QColor(options['bgcolor.hovered'])
-        bordersize = options['borderwidth.hovered']
+        return HOVERED
+    return NORMAL
+
+
+def get_interned(kind, key, factory):
+    """
+    return the paint object of the given kind built from the key, the
+    objects are created once by factory(*key) and shared by every caller.
+    They must never be modified. The least recently used objects of a kind
+    are dropped when INTERNING_CACHE_SIZE is reached.
+    """
+    objects = _interned.setdefault(kind, OrderedDict())
+    stats = _interning_stats.setdefault(kind, {'hits': 0, 'misses': 0})
+    value = objects.pop(key, None)
+    if value is None:
+        stats['misses'] += 1
+        value = factory(*key)
     else:
-        bordercolor = QtGui.QColor(options['bordercolor.normal'])
-        backgroundcolor = QtGui.QColor(options['bgcolor.normal'])
-        bordersize = options['borderwidth.normal']
-    textcolor = QtGui.QColor(options['text.color'])
-    alpha = options['bordercolor.transparency'] if options['border'] else 255
-    bordercolor.setAlpha(255 - alpha)
-    backgroundcolor.setAlpha(255 - options['bgcolor.transparency'])
-
-    pen = QtGui.QPen(bordercolor)
+        stats['hits'] += 1
+    objects[key] = value
+    while len(objects) > INTERNING_CACHE_SIZE:
+        objects.popitem(last=False)
+    return value
+
+
+def get_interning_stats():
+    return {kind: stats.copy() for kind, stats in _interning_stats.items()}
+
+
+def clear_interned():
+    _interned.clear()
+    _interning_stats.clear()
+
+
+def create_color(name, alpha=255):
+    color = QtGui.QColor(name)
+    color.setAlpha(alpha)
+    return color
+
+
+def create_pen(name, alpha=255, width=None):
+    pen = QtGui.QPen(get_color(name, alpha))
     pen.setStyle(QtCore.Qt.SolidLine)
-    pen.setWidthF(bordersize)
+    if width is not None:
+        pen.setWidthF(width)
+    return pen
+
+
+def create_brush(name, alpha=255):
+    return QtGui.QBrush(get_color(name, alpha))
+
+
+def create_font(bold, italic, size):
+    font = QtGui.QFont()
+    font.setBold(bold)
+    font.setItalic(italic)
+    font.setPixelSize(size)
+    return font
+
+
+def get_color(name, alpha=255):
+    return get_interned('color', (name, alpha), create_color)
+
+
+def get_pen(name, alpha=255, width=None):
+    return get_interned('pen', (name, alpha, width), create_pen)
+
+
+def get_brush(name, alpha=255):
+    return get_interned('brush', (name, alpha), create_brush)
+
+
+def get_font(bold, italic, size):
+    return get_interned('font', (bold, italic, size), create_font)
+
+
+def draw_shape(painter, shape, state=None):
+    content_rect = shape.content_rect()
+    state = get_shape_state(shape) if state is None else state
+    pen, brush, _ = shape.styles[state]
     painter.setPen(pen)
-    painter.setBrush(QtGui.QBrush(backgroundcolor))
-    if options['shape'] == 'square':
-        painter.drawRect(shape.rect)
-    else:
+    painter.setBrush(brush)
+    if shape.round:
         painter.drawEllipse(shape.rect)
+    else:
+        painter.drawRect(shape.rect)
 
     if shape.pixmap is not None:
         rect = shape.image_rect or content_rect
         painter.drawPixmap(rect, shape.pixmap)
 
-    painter.setPen(QtGui.QPen(textcolor))
-    painter.setBrush(QtGui.QBrush(textcolor))
+    if not shape.text:
+        return
+    painter.setPen(shape.textpen)
+    painter.setBrush(shape.textbrush)
+    painter.setFont(shape.font)
+    layout = shape.get_text_layout(content_rect)
+    if layout is None:
+        rect = QtCore.QRectF(content_rect)
+        painter.drawText(rect, shape.text_flags, shape.text)
+        return
+    draw_text_layout(painter, content_rect, layout)
+
+
+def create_text_layout(text, font, flags, width, height):
+    """
+    lay out a plain text as painter.drawText would do it in a rect of the
+    given size. Return a tuple (static_text, top) where top is the text
+    offset from the rect top. Return None if the text
+    overflows the rect: drawText clips it faster than a clipped painter
+    draws the static text.
+    """
+    # QStaticText ignores the new line characters, the unicode line
+    # separator is the one breaking the lines.
+    static_text = QtGui.QStaticText(text.replace('\n', u'\u2028'))
+    static_text.setTextFormat(QtCore.Qt.PlainText)
     option = QtGui.QTextOption()
-    flags = VALIGNS[options['text.valign']] | HALIGNS[options['text.halign']]
-    option.setAlignment(flags)
-    font = QtGui.QFont()
-    font.setBold(options['text.bold'])
-    font.setItalic(options['text.italic'])
-    font.setPixelSize(options['text.size'])
-    painter.setFont(font)
-    text = options['text.content']
-    painter.drawText(QtCore.QRectF(content_rect), flags, text)
+    option.setAlignment(flags & QtCore.Qt.AlignHorizontal_Mask)
+    option.setWrapMode(QtGui.QTextOption.NoWrap)
+    static_text.setTextOption(option)
+    static_text.setTextWidth(width)
+    static_text.prepare(QtGui.QTransform(), font)
+    size = static_text.size()
+    if size.width() > width or size.height() > height:
+        return None
+    top = 0
+    if flags & QtCore.Qt.AlignVCenter:
+        top = (height - size.height()) / 2.0
+    elif flags & QtCore.Qt.AlignBottom:
+        top = height - size.height()
+    return static_text, top
+
+
+def draw_text_layout(painter, rect, layout):
+    static_text, top = layout
+    point = QtCore.QPointF(rect.left(), rect.top() + top)
+    painter.drawStaticText(point, static_text)
+
+
+def render_shape_tile(shape, state, rect, ratio=1.0):
+    """
+    render the shape in the given state into a transparent pixmap covering
+    the rect. The ratio is the device pixel ratio of the target paint
+    device, the tile is rendered at native resolution for hidpi screens.
+    """
+    width = int(math.ceil(rect.width() * ratio))
+    height = int(math.ceil(rect.height() * ratio))
+    size = QtCore.QSize(width, height)
+    pixmap = QtGui.QPixmap(size)
+    pixmap.setDevicePixelRatio(ratio)
+    pixmap.fill(QtCore.Qt.transparent)
+    painter = QtGui.QPainter()
+    painter.begin(pixmap)
+    painter.setRenderHint(QtGui.QPainter.Antialiasing)
+    painter.translate(-rect.left(), -rect.top())
+    draw_shape(painter, shape, state)
+    painter.end()
+    return pixmap
 
 
 def draw_selection_square(painter, rect):
@@ -154,7 +310,7 @@ def draw_aiming_background(painter, rect):
 
 def draw_aiming(painter, center, target):
     pen = QtGui.QPen(QtGui.QColor(35, 35, 35))
-    pen.setWidth(3)
+    pen.setWidth(AIMING_WIDTH)
     painter.setPen(pen)
     painter.setBrush(QtGui.QColor(0, 0, 0, 0))
     painter.drawLine(center, target)
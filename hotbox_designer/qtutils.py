@@ -1,5 +1,6 @@
 # coding=utf-8
 import os
+from collections import OrderedDict
 from PySide2 import QtGui, QtWidgets, QtCore
 
 VALIGNS = {
@@ -11,6 +12,8 @@ HALIGNS = {
         'center': QtCore.Qt.AlignHCenter,
         'right': QtCore.Qt.AlignRight}
 ICONDIR = os.path.dirname(__file__)
+PIXMAP_CACHE_SIZE = 256
+_pixmaps = OrderedDict()
 
 
 def icon(filename):
@@ -24,3 +27,34 @@ def get_cursor(widget):
 def set_shortcut(keysequence, parent, method):
     shortcut = QtWidgets.QShortcut(QtGui.QKeySequence(keysequence), parent)
     shortcut.activated.connect(method)
+    return shortcut
+
+
+def get_pixmap(path):
+    """
+    return a QPixmap shared by every shape using the same image path.
+    The pixmaps are cached by path and validated with the file modification
+    time, the least recently used are dropped when PIXMAP_CACHE_SIZE is
+    reached. Return None if the path is empty or doesn't exist.
+    """
+    if not path:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _pixmaps.pop(path, None)
+    if cached is not None and cached[0] == mtime:
+        _pixmaps[path] = cached
+        return cached[1]
+
+    pixmap = QtGui.QPixmap(path)
+    _pixmaps[path] = mtime, pixmap
+    while len(_pixmaps) > PIXMAP_CACHE_SIZE:
+        _pixmaps.popitem(last=False)
+    return pixmap
+
+
+def clear_pixmap_cache():
+    _pixmaps.clear()
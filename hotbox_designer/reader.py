@@ -1,9 +1,14 @@
 # coding=utf-8
+import time
 from PySide2 import QtWidgets, QtCore, QtGui
 from hotbox_designer.interactive import Shape
 from hotbox_designer.qtutils import get_cursor
-from hotbox_designer.painting import draw_aiming, draw_aiming_background
-from hotbox_designer.geometry import distance, segment_cross_rect
+from hotbox_designer.painting import draw_aiming, draw_aiming_background, AIMING_WIDTH
+from hotbox_designer.spatialindex import ShapeIndex
+from hotbox_designer.aiming import AimingResolver, get_crossed_shape
+from hotbox_designer.rendering import create_canvas
+from hotbox_designer.languages import INLINE
+from hotbox_designer import telemetry
 
 
 class HotboxWidget(QtWidgets.QWidget):
@@ -12,18 +17,24 @@ class HotboxWidget(QtWidgets.QWidget):
         self.setMouseTracking(True)
         self.shapes = []
         self.interactive_shapes = []
+        self.hovered_shapes = []
+        self.index = ShapeIndex()
         self.left_clicked = False
         self.right_clicked = False
 
     def set_hotbox_data(self, hotbox_data):
         self.shapes = [Shape(shape) for shape in hotbox_data['shapes']]
         self.interactive_shapes = [
-                s for s in self.shapes if s.is_interactive()]
+                s for s in self.shapes if s.interactive]
+        self.hovered_shapes = []
+        self.index.build(self.interactive_shapes)
         self.repaint()
 
     def clear(self):
         self.shapes = []
         self.interactive_shapes = []
+        self.hovered_shapes = []
+        self.index.build([])
         self.repaint()
 
     @property
@@ -31,14 +42,18 @@ class HotboxWidget(QtWidgets.QWidget):
         return self.right_clicked or self.left_clicked
 
     def mouseMoveEvent(self, _):
-        shapes = self.interactive_shapes
-        set_shapes_hovered(shapes, get_cursor(self), self.clicked)
-        self.repaint()
+        self.set_hovered_shapes()
 
     def leaveEvent(self, _):
-        shapes = self.interactive_shapes
-        set_shapes_hovered(shapes, get_cursor(self), self.clicked)
-        self.repaint()
+        self.set_hovered_shapes()
+
+    def set_hovered_shapes(self):
+        cursor = get_cursor(self)
+        shapes = get_hover_candidates(self.index, self.hovered_shapes, cursor)
+        changed = set_shapes_hovered(shapes, cursor, self.clicked)
+        self.hovered_shapes = [s for s in shapes if s.hovered or s.clicked]
+        if changed:
+            self.update(get_shapes_region(changed))
 
     def mousePressEvent(self, event):
         if event.button() == QtCore.Qt.RightButton:
@@ -46,7 +61,7 @@ class HotboxWidget(QtWidgets.QWidget):
         elif event.button() == QtCore.Qt.LeftButton:
             self.left_clicked = True
         for shape in self.shapes:
-            if shape.is_interactive():
+            if shape.interactive:
                 if shape.hovered and self.clicked:
                     shape.clicked = True
                 else:
@@ -63,16 +78,16 @@ class HotboxWidget(QtWidgets.QWidget):
             self.left_clicked = False
 
         for shape in self.shapes:
-            if shape.is_interactive():
+            if shape.interactive:
                 shape.clicked = bool(shape.hovered and self.clicked)
         self.repaint()
 
-    def paintEvent(self, _):
+    def paintEvent(self, event):
         painter = QtGui.QPainter()
         painter.begin(self)
         painter.setRenderHint(QtGui.QPainter.Antialiasing)
-        for shape in self.shapes:
-            shape.draw(painter)
+        for shape in get_shapes_to_paint(self.shapes, event.rect()):
+            shape.draw_cached(painter)
         painter.end()
 
 
@@ -87,6 +102,7 @@ class HotboxReader(QtWidgets.QWidget):
         self.setMouseTracking(True)
 
         settings = hotbox_data['general']
+        self.name = settings['name']
         self.triggering = settings['triggering']
         self.aiming = settings['aiming']
         self.is_submenu = settings['submenu']
@@ -95,24 +111,26 @@ class HotboxReader(QtWidgets.QWidget):
         self.shapes = [Shape(data) for data in hotbox_data['shapes']]
         self.close_on_leave = settings['leaveclose']
         self.interactive_shapes = [
-                s for s in self.shapes if s.is_interactive()]
+                s for s in self.shapes if s.interactive]
+        self.hovered_shapes = []
+        self.index = ShapeIndex(self.interactive_shapes)
+        self.aiming_resolver = AimingResolver(
+            self.interactive_shapes, self.index)
+        for shape in self.interactive_shapes:
+            shape.precompile()
 
         self.left_clicked = False
         self.right_clicked = False
+        self.aiming_target = self.center
+        self.canvas = create_canvas(self, settings['renderer'])
 
     def mouseMoveEvent(self, _):
         self.set_hovered_shapes()
 
     def leaveEvent(self, _):
-        shapes = self.interactive_shapes
-        if self.aiming is True:
-            set_crossed_shapes_hovered(
-                    self.center, get_cursor(self), shapes, get_cursor(self))
-        else:
-            set_shapes_hovered(shapes, get_cursor(self), self.clicked)
+        self.set_hovered_shapes()
         if self.close_on_leave is True:
             self.hide()
-        self.repaint()
 
     @property
     def clicked(self):
@@ -132,16 +150,17 @@ class HotboxReader(QtWidgets.QWidget):
         elif event.button() == QtCore.Qt.LeftButton:
             self.left_clicked = True
         for shape in self.shapes:
-            if shape.is_interactive():
+            if shape.interactive:
                 if shape.hovered and self.clicked:
                     shape.clicked = True
                 else:
                     shape.clicked = False
-        self.repaint()
+        self.refresh()
 
     def mouseReleaseEvent(self, event):
         close = execute_hovered_shape(
-                self.shapes, self.left_clicked, self.right_clicked)
+                self.shapes, self.left_clicked, self.right_clicked,
+                hotbox=self.name)
 
         if event.button() == QtCore.Qt.RightButton:
             self.right_clicked = False
@@ -149,16 +168,35 @@ class HotboxReader(QtWidgets.QWidget):
             self.left_clicked = False
 
         for shape in self.shapes:
-            if shape.is_interactive():
+            if shape.interactive:
                 shape.clicked = bool(shape.hovered and self.clicked)
 
         if close is True:
             self.hide()
-        self.repaint()
+        self.refresh()
+
+    def refresh(self, region=None):
+        """
+        repaint the given region, or everything synchronously if no region
+        is given. The OpenGL canvas is always repainted entirely.
+        """
+        widget = self.canvas if self.canvas is not None else self
+        if region is None:
+            widget.repaint()
+        elif self.canvas is not None:
+            widget.update()
+        else:
+            widget.update(region)
 
-    def paintEvent(self, _):
+    def paintEvent(self, event):
+        if self.canvas is not None:
+            return
         painter = QtGui.QPainter()
         painter.begin(self)
+        self.paint(painter, event.rect())
+        painter.end()
+
+    def paint(self, painter, rect):
         painter.setRenderHint(QtGui.QPainter.Antialiasing)
         # this is a workaround because a fully transparent widget doesn't
         # execute the mouseMove event when the cursor is hover a
@@ -166,21 +204,24 @@ class HotboxReader(QtWidgets.QWidget):
         # rect with a 1/255 transparency value
         draw_aiming_background(painter, self.rect())
 
-        for shape in self.shapes:
-            shape.draw(painter)
+        for shape in get_shapes_to_paint(self.shapes, rect):
+            shape.draw_cached(painter)
         if self.aiming:
-            draw_aiming(painter, self.center, get_cursor(self))
-        painter.end()
+            draw_aiming(painter, self.center, self.aiming_target)
 
     def show(self):
+        start = time.time()
         self.move(QtGui.QCursor.pos() - self.center)
+        self.aiming_target = self.center
         super(HotboxReader, self).show()
         self.set_hovered_shapes()
         self.setFocus()
+        telemetry.record(telemetry.SHOW, time.time() - start, self.name)
 
     def hide(self):
+        start = time.time()
         if self.triggering == 'click or close':
-            execute_hovered_shape(self.shapes, left=True)
+            execute_hovered_shape(self.shapes, left=True, hotbox=self.name)
         if self.is_submenu is False:
             self.hideSubmenusRequested.emit()
 
@@ -188,18 +229,37 @@ class HotboxReader(QtWidgets.QWidget):
         for shape in self.interactive_shapes:
             shape.hovered = False
             shape.clicked = False
+        self.hovered_shapes = []
         # clean the aiming shape before close
         self.clear_aiming()
         super(HotboxReader, self).hide()
+        telemetry.record(telemetry.HIDE, time.time() - start, self.name)
 
     def set_hovered_shapes(self):
-        shapes = self.interactive_shapes
+        """
+        update the shapes hover states and schedule a paint of the regions
+        which changed only: the shapes which changed state and the aiming
+        line. Nothing is painted if the cursor move didn't change anything.
+        """
+        cursor = get_cursor(self)
         if self.aiming is True:
-            set_crossed_shapes_hovered(
-                    self.center, get_cursor(self), shapes, get_cursor(self))
+            shapes = self.hovered_shapes
+            changed = set_crossed_shapes_hovered(
+                    self.center, cursor, shapes, cursor, self.aiming_resolver)
+            shapes = shapes + [s for s in changed if s not in shapes]
         else:
-            set_shapes_hovered(shapes, get_cursor(self), self.clicked)
-        self.repaint()
+            shapes = get_hover_candidates(
+                self.index, self.hovered_shapes, cursor)
+            changed = set_shapes_hovered(shapes, cursor, self.clicked)
+        self.hovered_shapes = [s for s in shapes if s.hovered or s.clicked]
+        region = get_shapes_region(changed)
+        if self.aiming is True and cursor != self.aiming_target:
+            region = region.united(
+                get_aiming_region(self.center, self.aiming_target))
+            region = region.united(get_aiming_region(self.center, cursor))
+            self.aiming_target = cursor
+        if not region.isEmpty():
+            self.refresh(region)
 
     def clear_aiming(self):
         """
@@ -211,51 +271,102 @@ class HotboxReader(QtWidgets.QWidget):
         if self.aiming is False:
             return
         self.aiming = False
-        self.repaint()
+        self.refresh()
         self.aiming = True
 
 
+def get_shapes_region(shapes):
+    region = QtGui.QRegion()
+    for shape in shapes:
+        region = region.united(shape.paint_rect())
+    return region
+
+
+def get_shapes_to_paint(shapes, rect):
+    return [shape for shape in shapes if shape.paint_rect().intersects(rect)]
+
+
+def get_aiming_region(center, target):
+    margin = AIMING_WIDTH + 1
+    rect = QtCore.QRect(center, target).normalized()
+    return QtGui.QRegion(rect.adjusted(-margin, -margin, margin, margin))
+
+
+def get_hover_candidates(index, hovered_shapes, cursor):
+    """
+    return the only shapes which can change of hover state for the given
+    cursor: the ones currently hovered and the ones under the cursor.
+    """
+    shapes = list(hovered_shapes)
+    shapes.extend(s for s in index.at_point(cursor) if s not in shapes)
+    return shapes
+
+
 def set_shapes_hovered(shapes, cursor, clicked):
     """
     this function all the given shapes.
     It set hovered the shape if his rect contains the cursor.
+    It returns the shapes which changed state.
     """
+    changed = []
     for shape in shapes:
-        if shape.is_interactive():
+        if shape.interactive:
+            state = shape.hovered, shape.clicked
             shape.set_hovered(cursor)
             shape.clicked = shape.hovered and clicked
+            if state != (shape.hovered, shape.clicked):
+                changed.append(shape)
+    return changed
 
 
-def set_crossed_shapes_hovered(point1, point2, shapes, cursor):
+def set_crossed_shapes_hovered(
+        point1, point2, shapes, cursor, resolver=None):
     """
     this is the function to set the hovered shape using the aiming system.
     It filter all shapes crossed by the given line and set the closest to the.
     cursor hovered.
+    If an aiming resolver is given, the hovered shape is searched with it
+    and the given shapes only need to contain the currently hovered ones.
+    It returns the shapes which changed state.
     """
+    hovered = [shape for shape in shapes if shape.hovered]
+    if resolver is not None:
+        target = resolver.resolve(point1, point2, cursor)
+    else:
+        target = get_crossed_shape(point1, point2, shapes, cursor)
     # reset hovered shape
-    for shape in shapes:
+    for shape in hovered:
         shape.hovered = False
-    # check first if a shape rect contain the cursor
-    for shape in shapes:
-        if shape.rect.contains(cursor):
-            shape.hovered = True
-            return
-    # filter all shapes crossed by a virtual line who joins the
-    # hotspot and the cursor
-    cshapes = [s for s in shapes if segment_cross_rect(point1, point2, s.rect)]
-    if not cshapes:
-        return
-    # process distance between all shape crossed and
-    # set the closest to the cursor hovered
-    shapedistances = {
-            distance(shape.rect.center(), cursor): shape
-            for shape in cshapes}
-    shapedistances[min(shapedistances.keys())].hovered = True
-
-
-def execute_hovered_shape(shapes, left=False, right=False):
+    if target is not None:
+        target.hovered = True
+    changed = [shape for shape in hovered if shape is not target]
+    if target is not None and target not in hovered:
+        changed.append(target)
+    return changed
+
+
+def execute_hovered_shape(shapes, left=False, right=False, hotbox=None):
     for shape in shapes:
-        if shape.is_interactive() and shape.hovered:
-            shape.execute(left=left, right=right)
+        if shape.interactive and shape.hovered:
+            execute_shape(shape, left, right, hotbox)
             return shape.autoclose(left=left, right=right)
     return False
+
+
+def execute_shape(shape, left=False, right=False, hotbox=None):
+    """
+    execute the shape action and record its duration if the telemetry is
+    enabled. The deferred and thread actions are recorded when they are
+    actually executed, by the languages module.
+    """
+    action = shape.get_action(left=left, right=right)
+    if telemetry.get_telemetry() is None or action is None:
+        return shape.execute(left=left, right=right, hotbox=hotbox)
+    language, _, mode = action
+    if mode != INLINE:
+        return shape.execute(left=left, right=right, hotbox=hotbox)
+    start = time.time()
+    shape.execute(left=left, right=right, hotbox=hotbox)
+    telemetry.record(
+        telemetry.EXECUTE, time.time() - start, hotbox=hotbox,
+        shape=shape.text, language=language)
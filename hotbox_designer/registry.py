@@ -0,0 +1,131 @@
+# coding=utf-8
+from collections import OrderedDict
+from PySide2 import QtCore
+
+
+class HotboxRegistry():
+    """
+    Hold the hotboxes data by hotbox name and build their readers lazily,
+    the first time they are requested. The manager updates or removes the
+    hotboxes edited, only their readers are dropped, the other ones stay
+    alive and don't pay the construction again at the next show.
+    The reader_factory is called with a hotbox data to create its reader.
+    The registry counts how many times each hotbox is requested, it is
+    used to prewarm the readers the most used.
+    Each hotbox can be registered with its source, the file it comes from,
+    to find the hotboxes concerned when a file changes.
+    """
+    def __init__(self, reader_factory):
+        self.reader_factory = reader_factory
+        self.loaded = False
+        self.usage = {}
+        self._datas = OrderedDict()
+        self._sources = {}
+        self._readers = {}
+        self._prewarm_queue = []
+
+    def load(self, hotboxes_datas, sources=None):
+        self.clear()
+        sources = sources or [None] * len(hotboxes_datas)
+        for hotbox_data, source in zip(hotboxes_datas, sources):
+            self.set_hotbox(hotbox_data, source=source)
+        self.loaded = True
+
+    def set_hotbox(self, hotbox_data, old_name=None, source=None):
+        """
+        register or replace the given hotbox, its reader will be created
+        at the next request. If the hotbox was renamed, the old name has to
+        be given to remove the obsolete reader.
+        """
+        name = hotbox_data['general']['name']
+        if old_name is not None and old_name != name:
+            self.remove(old_name)
+            if old_name in self.usage:
+                self.usage[name] = self.usage.pop(old_name)
+        self.remove(name)
+        self._datas[name] = hotbox_data
+        self._sources[name] = source
+
+    def get_data(self, name):
+        return self._datas.get(name)
+
+    @property
+    def sources(self):
+        return set(self._sources.values())
+
+    def get_names(self, source):
+        return [
+            name for name in self._datas if self._sources.get(name) == source]
+
+    def remove(self, name):
+        self._datas.pop(name, None)
+        self._sources.pop(name, None)
+        reader = self._readers.pop(name, None)
+        if reader is None:
+            return
+        reader.hide()
+        reader.deleteLater()
+
+    def clear(self):
+        for name in list(self._datas):
+            self.remove(name)
+        self._prewarm_queue = []
+        self.loaded = False
+
+    def get_reader(self, name):
+        reader = self._readers.get(name)
+        if reader is None:
+            reader = self.reader_factory(self._datas[name])
+            self._readers[name] = reader
+        return reader
+
+    def is_built(self, name):
+        return name in self._readers
+
+    @property
+    def readers(self):
+        """
+        return the readers already built.
+        """
+        return list(self._readers.values())
+
+    def record_usage(self, name):
+        self.usage[name] = self.usage.get(name, 0) + 1
+
+    def get_most_used(self, count):
+        names = sorted(
+            self._datas, key=lambda name: self.usage.get(name, 0),
+            reverse=True)
+        return [name for name in names if self.usage.get(name)][:count]
+
+    def prewarm(self, count):
+        """
+        build the readers of the most used hotboxes, one per event loop
+        iteration, to keep the application responsive meanwhile.
+        """
+        self._prewarm_queue = [
+            name for name in self.get_most_used(count)
+            if not self.is_built(name)]
+        if self._prewarm_queue:
+            QtCore.QTimer.singleShot(0, self._prewarm_next)
+
+    def _prewarm_next(self):
+        if not self._prewarm_queue:
+            return
+        name = self._prewarm_queue.pop(0)
+        if name in self._datas:
+            self.get_reader(name)
+        if self._prewarm_queue:
+            QtCore.QTimer.singleShot(0, self._prewarm_next)
+
+    def __getitem__(self, name):
+        return self.get_reader(name)
+
+    def __contains__(self, name):
+        return name in self._datas
+
+    def __iter__(self):
+        return iter(list(self._datas))
+
+    def __len__(self):
+        return len(self._datas)
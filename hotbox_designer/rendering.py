@@ -0,0 +1,95 @@
+# coding=utf-8
+import logging
+from PySide2 import QtCore, QtGui
+try:
+    from PySide2.QtWidgets import QOpenGLWidget
+except ImportError:
+    QOpenGLWidget = None
+
+RASTER = 'raster'
+OPENGL = 'opengl'
+RENDERERS = RASTER, OPENGL
+logger = logging.getLogger('hotbox_designer')
+_opengl_available = None
+
+
+def is_opengl_available():
+    """
+    check once if an OpenGL context can be created. It fails when the
+    binding doesn't have QOpenGLWidget or when the platform has no GL, e.g.
+    the offscreen platform without a GLX or EGL display.
+    """
+    global _opengl_available
+    if _opengl_available is None:
+        _opengl_available = create_opengl_context()
+        if not _opengl_available:
+            logger.warning(
+                'OpenGL unavailable, hotboxes use the raster renderer')
+    return _opengl_available
+
+
+def create_opengl_context():
+    if QOpenGLWidget is None:
+        return False
+    context = QtGui.QOpenGLContext()
+    if not context.create():
+        return False
+    surface = QtGui.QOffscreenSurface()
+    surface.create()
+    current = bool(context.makeCurrent(surface))
+    context.doneCurrent()
+    return current
+
+
+def get_renderer(renderer):
+    """
+    return the renderer which can be used, the OpenGL one falls back on
+    the raster one if the GL isn't available.
+    """
+    if renderer == OPENGL and not is_opengl_available():
+        return RASTER
+    return renderer
+
+
+def get_surface_format():
+    surface_format = QtGui.QSurfaceFormat()
+    surface_format.setAlphaBufferSize(8)
+    surface_format.setSamples(4)
+    return surface_format
+
+
+if QOpenGLWidget is not None:
+    class OpenGLCanvas(QOpenGLWidget):
+        """
+        transparent OpenGL surface covering its parent. The parent keeps
+        the mouse events and does the painting through paint(painter, rect).
+        The shapes tiles are pixmaps, the GL paint engine uploads them once
+        as textures and reuses these until the tiles are invalidated.
+        """
+        def __init__(self, parent):
+            super(OpenGLCanvas, self).__init__(parent)
+            self.setFormat(get_surface_format())
+            self.setAttribute(QtCore.Qt.WA_AlwaysStackOnTop)
+            self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+            self.resize(parent.size())
+
+        def paintGL(self):
+            painter = QtGui.QPainter(self)
+            painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+            painter.fillRect(self.rect(), QtCore.Qt.transparent)
+            painter.setCompositionMode(
+                QtGui.QPainter.CompositionMode_SourceOver)
+            self.parent().paint(painter, self.rect())
+            painter.end()
+else:
+    OpenGLCanvas = None
+
+
+def create_canvas(widget, renderer):
+    """
+    return an OpenGL canvas painting the widget if the renderer is OpenGL,
+    otherwise None and the widget paints itself.
+    """
+    if get_renderer(renderer) != OPENGL:
+        return None
+    return OpenGLCanvas(widget)
@@ -0,0 +1,82 @@
+# coding=utf-8
+import threading
+from collections import OrderedDict
+from PySide2 import QtCore
+from hotbox_designer.data import save_datas, get_file_signature
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+SAVE_DELAY = 500  # milliseconds
+# signature (size, mtime) of the last file written by the schedulers, used
+# to distinguish the session own saves from the external modifications.
+_written_signatures = {}
+
+
+def is_self_written(filename, signature):
+    return (
+        signature is not None and
+        _written_signatures.get(filename) == signature)
+
+
+class SaveScheduler(QtCore.QObject):
+    """
+    Debounce the files saving and write them from a worker thread.
+    schedule() registers a getter returning the data to save, it is called
+    on the UI thread when the delay expires, so the serialization and the
+    writing never touch data being edited. Successive schedules of the same
+    file before the delay are merged in one write.
+    flush() writes synchronously everything pending, it has to be called
+    before reading back a scheduled file and before quitting.
+    """
+    saveFailed = QtCore.Signal(str, str)
+
+    def __init__(self, delay=SAVE_DELAY, parent=None):
+        super(SaveScheduler, self).__init__(parent)
+        self._getters = OrderedDict()
+        self._queue = Queue()
+        self._worker = None
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self._submit)
+
+    @property
+    def pending(self):
+        return bool(self._getters) or self._queue.unfinished_tasks > 0
+
+    def schedule(self, filename, getter, writer=save_datas):
+        """
+        the writer is called from the worker thread with the filename and
+        the data returned by the getter.
+        """
+        self._getters[filename] = getter, writer
+        self.timer.start()
+
+    def flush(self):
+        self.timer.stop()
+        self._submit()
+        self._queue.join()
+
+    def _submit(self):
+        if not self._getters:
+            return
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work)
+            self._worker.daemon = True
+            self._worker.start()
+        while self._getters:
+            filename, (getter, writer) = self._getters.popitem(last=False)
+            self._queue.put((filename, getter(), writer))
+
+    def _work(self):
+        while True:
+            filename, data, writer = self._queue.get()
+            try:
+                writer(filename, data)
+                _written_signatures[filename] = get_file_signature(filename)
+            except Exception as e:
+                self.saveFailed.emit(filename, str(e))
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,123 @@
+# coding=utf-8
+from hotbox_designer.templates import HOTBOX, SQUARE_BUTTON, TEXT, BACKGROUND
+
+SCHEMA_VERSION = 4
+# ordered list of (version, function), the function converts a hotbox data
+# from the previous version to the given one.
+MIGRATIONS = []
+SHAPE_TEMPLATES = SQUARE_BUTTON, TEXT, BACKGROUND
+
+
+def migration(version):
+    def register(function):
+        MIGRATIONS.append((version, function))
+        MIGRATIONS.sort(key=lambda migration: migration[0])
+        return function
+    return register
+
+
+def get_schema_version(data):
+    # the data saved before the schema versioning are considered as version 0
+    return data.get('schema_version', 0)
+
+
+def is_up_to_date(data):
+    return get_schema_version(data) == SCHEMA_VERSION
+
+
+def migrate_hotbox_data(data):
+    """
+    run the migrations needed to bring the hotbox data to the current schema
+    version, then complete the options missing, see complete_hotbox_data.
+    The schema_version key is removed, it is only stored in the files.
+    """
+    validate_hotbox_data(data)
+    version = get_schema_version(data)
+    if version > SCHEMA_VERSION:
+        raise ValueError(
+            'hotbox schema version {} is not supported'.format(version))
+    for migration_version, function in MIGRATIONS:
+        if migration_version > version:
+            data = function(data)
+    data = complete_hotbox_data(data)
+    data.pop('schema_version', None)
+    return data
+
+
+def validate_hotbox_data(data):
+    if not isinstance(data, dict):
+        raise ValueError('hotbox data must be a dict')
+    if not isinstance(data.get('general'), dict):
+        raise ValueError('hotbox data has no general settings')
+    shapes = data.get('shapes')
+    if not isinstance(shapes, list):
+        raise ValueError('hotbox data has no shapes list')
+    if not all(isinstance(shape, dict) for shape in shapes):
+        raise ValueError('hotbox shapes must be dicts')
+
+
+def complete_hotbox_data(data):
+    """
+    set the options missing to their default value. It runs on every read,
+    the up to date data included, because a file edited by hand can lack
+    options the reader expects. The shapes defaults come from the template
+    they are the closest to, the templates all have the same options.
+    """
+    for key, value in HOTBOX.items():
+        data['general'].setdefault(key, value)
+    for shape in data['shapes']:
+        missing = [key for key in SQUARE_BUTTON if key not in shape]
+        if not missing:
+            continue
+        template = get_closest_template(shape)
+        for key in missing:
+            shape[key] = template[key]
+    return data
+
+
+def get_closest_template(options):
+    def count_matches(template):
+        return sum(
+            1 for key, value in template.items()
+            if key in options and options[key] == value)
+    return max(SHAPE_TEMPLATES, key=count_matches)
+
+
+@migration(1)
+def move_submenu_to_general(data):
+    """
+    the first versions stored the submenu setting out of the general
+    settings and didn't have the leaveclose option.
+    """
+    data.pop('submenu', None)
+    data['general'].setdefault('submenu', False)
+    data['general'].setdefault('leaveclose', False)
+    return data
+
+
+@migration(2)
+def fill_missing_options(data):
+    """
+    every option is expected by the reader, the options missing are set to
+    their template default value.
+    """
+    for key, value in HOTBOX.items():
+        data['general'].setdefault(key, value)
+    for shape in data['shapes']:
+        for key, value in SQUARE_BUTTON.items():
+            shape.setdefault(key, value)
+    return data
+
+
+@migration(3)
+def add_actions_mode(data):
+    for shape in data['shapes']:
+        shape.setdefault('action.left.mode', 'inline')
+        shape.setdefault('action.right.mode', 'inline')
+    return data
+
+
+@migration(4)
+def add_renderer(data):
+    data['general'].setdefault('renderer', 'raster')
+    return data
@@ -0,0 +1,142 @@
+# coding=utf-8
+import math
+from hotbox_designer.geometry import segment_cross_rect
+
+CELL_SIZE = 64
+
+
+class ShapeIndex():
+    """
+    Uniform grid spatial index used for the shapes hit-testing.
+    Every shape is registered in the grid cells overlapped by its rect. The
+    queries only test the shapes registered in the cells concerned and
+    return them sorted in the given shapes order (the painting order).
+    When a shape rect changes, call update() to move it in the grid. When
+    the shapes order changes, the index has to be rebuilt.
+    """
+    def __init__(self, shapes=None, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._shapes = {}
+        self._order = 0
+        self.build(shapes or [])
+
+    def build(self, shapes):
+        self._cells = {}
+        self._shapes = {}
+        self._order = 0
+        for shape in shapes:
+            self.insert(shape)
+
+    def insert(self, shape):
+        cells = self._rect_cells(shape.rect)
+        self._shapes[shape] = self._order, cells
+        self._order += 1
+        for cell in cells:
+            self._cells.setdefault(cell, []).append(shape)
+
+    def remove(self, shape):
+        _, cells = self._shapes.pop(shape)
+        for cell in cells:
+            self._cells[cell].remove(shape)
+            if not self._cells[cell]:
+                del self._cells[cell]
+
+    def update(self, shape):
+        order, cells = self._shapes[shape]
+        new_cells = self._rect_cells(shape.rect)
+        if new_cells == cells:
+            return
+        for cell in cells:
+            self._cells[cell].remove(shape)
+            if not self._cells[cell]:
+                del self._cells[cell]
+        for cell in new_cells:
+            self._cells.setdefault(cell, []).append(shape)
+        self._shapes[shape] = order, new_cells
+
+    def __contains__(self, shape):
+        return shape in self._shapes
+
+    def at_point(self, point):
+        cell = self._cell(point.x(), point.y())
+        shapes = self._cells.get(cell, [])
+        return self._sorted([s for s in shapes if s.rect.contains(point)])
+
+    def intersecting(self, rect):
+        shapes = set()
+        for cell in self._rect_cells(rect.normalized()):
+            shapes.update(self._cells.get(cell, []))
+        return self._sorted([s for s in shapes if s.rect.intersects(rect)])
+
+    def crossing_segment(self, point1, point2):
+        shapes = set()
+        for cell in self._segment_cells(point1, point2):
+            shapes.update(self._cells.get(cell, []))
+        return self._sorted([
+            s for s in shapes if segment_cross_rect(point1, point2, s.rect)])
+
+    def _sorted(self, shapes):
+        return sorted(shapes, key=lambda shape: self._shapes[shape][0])
+
+    def _cell(self, x, y):
+        return (
+            int(math.floor(x / float(self.cell_size))),
+            int(math.floor(y / float(self.cell_size))))
+
+    def _rect_cells(self, rect):
+        left, top = self._cell(rect.left(), rect.top())
+        right, bottom = self._cell(rect.right(), rect.bottom())
+        return [
+            (x, y)
+            for x in range(left, right + 1)
+            for y in range(top, bottom + 1)]
+
+    def _segment_cells(self, point1, point2):
+        """
+        this method list the cells traversed by the segment, using the
+        grid traversal algorithm from Amanatides & Woo. When the segment
+        crosses exactly a cell corner, both neighbour cells are listed.
+        """
+        size = float(self.cell_size)
+        x1, y1 = point1.x() / size, point1.y() / size
+        x2, y2 = point2.x() / size, point2.y() / size
+        x, y = int(math.floor(x1)), int(math.floor(y1))
+        end_x, end_y = int(math.floor(x2)), int(math.floor(y2))
+        dx, dy = x2 - x1, y2 - y1
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        if dx:
+            delta_x = abs(1.0 / dx)
+            border = (x + 1 - x1) if dx > 0 else (x1 - x)
+            max_x = border * delta_x
+        else:
+            delta_x = max_x = float('inf')
+        if dy:
+            delta_y = abs(1.0 / dy)
+            border = (y + 1 - y1) if dy > 0 else (y1 - y)
+            max_y = border * delta_y
+        else:
+            delta_y = max_y = float('inf')
+
+        cells = [(x, y)]
+        steps = abs(end_x - x) + abs(end_y - y)
+        while steps > 0:
+            if max_x == max_y:
+                cells.append((x + step_x, y))
+                cells.append((x, y + step_y))
+                x += step_x
+                y += step_y
+                max_x += delta_x
+                max_y += delta_y
+                steps -= 2
+            elif max_x < max_y:
+                x += step_x
+                max_x += delta_x
+                steps -= 1
+            else:
+                y += step_y
+                max_y += delta_y
+                steps -= 1
+            cells.append((x, y))
+        return cells
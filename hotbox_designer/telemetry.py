@@ -0,0 +1,131 @@
+# coding=utf-8
+import os
+import json
+import time
+import threading
+
+TELEMETRY_ENVVAR = 'HOTBOXES_TELEMETRY'
+MAX_RECORDS = 10000
+EXECUTE = 'execute'
+SHOW = 'show'
+HIDE = 'hide'
+_telemetry = None
+
+
+class Telemetry():
+    """
+    Rolling log of the hotboxes events. Each record is a dict stored as one
+    json line: {'event', 'time', 'duration', 'hotbox', 'shape', 'language'}
+    where duration is in milliseconds. The records are appended to the file
+    as they come, the file is rewritten with the last max_records records
+    when it grows over one and a half time this size. The deferred and
+    thread actions are recorded from the thread executing them.
+    """
+    def __init__(self, filename=None, max_records=MAX_RECORDS):
+        self.filename = filename
+        self.max_records = max_records
+        self.records = []
+        self.lock = threading.Lock()
+        if filename is not None:
+            self.records = load_records(filename)[-max_records:]
+
+    def record(self, event, duration, hotbox=None, shape=None, language=None):
+        record = {
+            'event': event,
+            'time': time.time(),
+            'duration': round(duration * 1000, 3),
+            'hotbox': hotbox,
+            'shape': shape,
+            'language': language}
+        with self.lock:
+            self.records.append(record)
+            if len(self.records) > self.max_records * 1.5:
+                self.records = self.records[-self.max_records:]
+                self._write(self.records, mode='w')
+            else:
+                self._write([record], mode='a')
+
+    def _write(self, records, mode):
+        if self.filename is None:
+            return
+        try:
+            with open(self.filename, mode) as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+        except (IOError, OSError):
+            pass
+
+    def get_actions_stats(self, hotbox=None):
+        """
+        return the execution stats aggregated by action: a list of dict
+        {'hotbox', 'shape', 'language', 'count', 'total', 'mean', 'max'}
+        """
+        stats = {}
+        for record in self.records:
+            if record['event'] != EXECUTE:
+                continue
+            if hotbox is not None and record['hotbox'] != hotbox:
+                continue
+            key = record['hotbox'], record['shape'], record['language']
+            stat = stats.get(key)
+            if stat is None:
+                stat = {
+                    'hotbox': key[0], 'shape': key[1], 'language': key[2],
+                    'count': 0, 'total': 0.0, 'max': 0.0}
+                stats[key] = stat
+            stat['count'] += 1
+            stat['total'] += record['duration']
+            stat['max'] = max(stat['max'], record['duration'])
+        for stat in stats.values():
+            stat['mean'] = stat['total'] / stat['count']
+        return list(stats.values())
+
+    def slowest(self, count=10, hotbox=None):
+        stats = self.get_actions_stats(hotbox)
+        return sorted(stats, key=lambda s: s['mean'], reverse=True)[:count]
+
+    def most_used(self, count=10, hotbox=None):
+        stats = self.get_actions_stats(hotbox)
+        return sorted(stats, key=lambda s: s['count'], reverse=True)[:count]
+
+    def clear(self):
+        self.records = []
+        self._write([], mode='w')
+
+
+def load_records(filename):
+    if not os.path.exists(filename):
+        return []
+    records = []
+    with open(filename, 'r') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # line truncated by an interrupted session
+                continue
+    return records
+
+
+def enable(filename=None, max_records=MAX_RECORDS):
+    global _telemetry
+    _telemetry = Telemetry(filename, max_records)
+    return _telemetry
+
+
+def disable():
+    global _telemetry
+    _telemetry = None
+
+
+def get_telemetry():
+    return _telemetry
+
+
+def is_requested():
+    return os.environ.get(TELEMETRY_ENVVAR, '') not in ('', '0')
+
+
+def record(event, duration, hotbox=None, shape=None, language=None):
+    if _telemetry is not None:
+        _telemetry.record(event, duration, hotbox, shape, language)
@@ -28,10 +28,12 @@ SQUARE_BUTTON = {
         'action.left.close': False,
         'action.left.language': 'python',  # or mel
         'action.left.command': '',
+        'action.left.mode': 'inline',  # or 'deferred' or 'thread'
         'action.right': False,
         'action.right.close': False,
         'action.right.language': 'python',  # or mel
         'action.right.command': '',
+        'action.right.mode': 'inline',  # or 'deferred' or 'thread'
         'image.path': '',
         'image.fit': True,
         'image.height': 32,
@@ -66,10 +68,12 @@ TEXT = {
         'action.left.close': False,
         'action.left.language': 'python',  # or mel
         'action.left.command': '',
+        'action.left.mode': 'inline',  # or 'deferred' or 'thread'
         'action.right': False,
         'action.right.close': False,
         'action.right.language': 'python',  # or mel
         'action.right.command': '',
+        'action.right.mode': 'inline',  # or 'deferred' or 'thread'
         'image.path': '',
         'image.fit': False,
         'image.height': 32,
@@ -104,10 +108,12 @@ BACKGROUND = {
         'action.left.close': False,
         'action.left.language': 'python',  # or mel
         'action.left.command': '',
+        'action.left.mode': 'inline',  # or 'deferred' or 'thread'
         'action.right': False,
         'action.right.close': False,
         'action.right.language': 'python',  # or mel
         'action.right.command': '',
+        'action.right.mode': 'inline',  # or 'deferred' or 'thread'
         'image.path': '',
         'image.fit': False,
         'image.height': 32,
@@ -122,5 +128,6 @@ HOTBOX = {
         'width': 900,
         'height': 600,
         'submenu': False,
-        'leaveclose': False
+        'leaveclose': False,
+        'renderer': 'raster'  # or 'opengl'
         }
@@ -0,0 +1,97 @@
+# coding=utf-8
+import os
+from PySide2 import QtCore
+from hotbox_designer.data import get_file_signature
+from hotbox_designer.saving import is_self_written
+
+WATCH_DELAY = 500  # milliseconds
+POLL_INTERVAL = 5000  # milliseconds
+
+
+class HotboxFilesWatcher(QtCore.QObject):
+    """
+    Watch the hotboxes files and emit filesChanged with the list of the
+    files modified. The notifications are batched: the signal is emitted
+    once the files stopped changing for the delay, so a burst of writes
+    (a publish updating dozens of files) produces one reload.
+    QFileSystemWatcher doesn't report the changes done on most network
+    filesystems, the files are also polled at regular interval. Both
+    sources are validated by comparing the files size and mtime, a
+    notification without actual change is ignored, as well as the files
+    written by the SaveScheduler of this session.
+    """
+    filesChanged = QtCore.Signal(list)
+
+    def __init__(
+            self, delay=WATCH_DELAY, poll_interval=POLL_INTERVAL, parent=None):
+        super(HotboxFilesWatcher, self).__init__(parent)
+        self._signatures = {}
+        self._pending = set()
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._file_notified)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self._emit_changes)
+        self.poll_timer = QtCore.QTimer(self)
+        self.poll_timer.setInterval(poll_interval)
+        self.poll_timer.timeout.connect(self.poll)
+        if poll_interval:
+            self.poll_timer.start()
+
+    @property
+    def files(self):
+        return sorted(self._signatures)
+
+    def set_files(self, filenames):
+        filenames = set(filenames)
+        signatures = {}
+        for filename in filenames:
+            if filename in self._signatures:
+                signatures[filename] = self._signatures[filename]
+            else:
+                signatures[filename] = get_file_signature(filename)
+        self._signatures = signatures
+        self._pending &= filenames
+        watched = self.watcher.files()
+        if watched:
+            self.watcher.removePaths(watched)
+        self._watch_existing_files()
+
+    def poll(self):
+        for filename in self._signatures:
+            self._check(filename)
+
+    def _file_notified(self, filename):
+        self._check(filename)
+
+    def _check(self, filename):
+        if filename not in self._signatures:
+            return
+        signature = get_file_signature(filename)
+        if signature == self._signatures[filename]:
+            return
+        self._signatures[filename] = signature
+        if is_self_written(filename, signature):
+            return
+        self._pending.add(filename)
+        self.timer.start()
+
+    def _emit_changes(self):
+        # a file replaced by a rename isn't watched anymore
+        self._watch_existing_files()
+        # the notification can come before the end of the session write
+        filenames = sorted(
+            filename for filename in self._pending
+            if not is_self_written(filename, get_file_signature(filename)))
+        self._pending = set()
+        if filenames:
+            self.filesChanged.emit(filenames)
+
+    def _watch_existing_files(self):
+        watched = set(self.watcher.files())
+        filenames = [
+            filename for filename in self._signatures
+            if filename not in watched and os.path.exists(filename)]
+        if filenames:
+            self.watcher.addPaths(filenames)
@@ -0,0 +1,41 @@
+# coding=utf-8
+import os
+import json
+import pytest
+from hotbox_designer.data import (
+    get_new_hotbox, load_hotbox_link, load_cached_hotbox, save_cached_hotbox,
+    compact_hotbox_data, expand_hotbox_data)
+from hotbox_designer.schema import SCHEMA_VERSION
+from hotbox_designer.templates import SQUARE_BUTTON, TEXT, BACKGROUND
+
+
+def test_outdated_cache_is_read_again(tmpdir):
+    link = str(tmpdir.join('hotbox.json'))
+    cache_folder = str(tmpdir.join('cache'))
+    with open(link, 'w') as f:
+        json.dump(get_new_hotbox([]), f)
+    stat = os.stat(link)
+    # cache written before the last migration was added
+    old_key = link, stat.st_size, stat.st_mtime, SCHEMA_VERSION - 1
+    outdated = get_new_hotbox([])
+    del outdated['general']['renderer']
+    save_cached_hotbox(cache_folder, old_key, outdated)
+
+    data, error = load_hotbox_link(link, cache_folder=cache_folder)
+    assert error is None
+    assert data['general']['renderer'] == 'raster'
+    key = link, stat.st_size, stat.st_mtime, SCHEMA_VERSION
+    assert load_cached_hotbox(cache_folder, key) == data
+
+
+@pytest.mark.parametrize('template', [SQUARE_BUTTON, TEXT, BACKGROUND])
+def test_compact_round_trip(template):
+    shape = template.copy()
+    shape.update({'shape.left': 12.0, 'text.content': 'modified'})
+    data = get_new_hotbox([])
+    data['shapes'] = [template.copy(), shape]
+    compact = json.loads(json.dumps(compact_hotbox_data(data)))
+    expanded = expand_hotbox_data(compact)
+    assert expanded['schema_version'] == SCHEMA_VERSION
+    del expanded['schema_version']
+    assert expanded == data
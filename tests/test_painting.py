@@ -0,0 +1,15 @@
+# coding=utf-8
+from hotbox_designer import painting
+
+
+def test_interned_least_recently_used_are_dropped(monkeypatch):
+    monkeypatch.setattr(painting, 'INTERNING_CACHE_SIZE', 2)
+    painting.clear_interned()
+    painting.get_interned('test', (1,), str)
+    painting.get_interned('test', (2,), str)
+    painting.get_interned('test', (1,), str)
+    painting.get_interned('test', (3,), str)
+    assert list(painting._interned['test']) == [(1,), (3,)]
+    stats = painting.get_interning_stats()['test']
+    assert stats == {'hits': 1, 'misses': 3}
+    painting.clear_interned()
@@ -0,0 +1,82 @@
+# coding=utf-8
+import os
+# the OpenGL canvas is checked with the Mesa software rasterizer
+os.environ['LIBGL_ALWAYS_SOFTWARE'] = '1'
+
+import pytest
+from PySide2 import QtCore, QtGui, QtWidgets
+from hotbox_designer.data import get_new_hotbox
+from hotbox_designer.reader import HotboxReader
+from hotbox_designer.rendering import OPENGL, RASTER, is_opengl_available
+from hotbox_designer.templates import BACKGROUND, SQUARE_BUTTON, TEXT
+
+# per channel difference tolerated for the antialiased edges
+TOLERANCE = 48
+MAX_DIFFERENT_PIXELS_RATIO = 0.01
+
+
+def get_application():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def create_hotbox_data(renderer):
+    data = get_new_hotbox([])
+    data['general'].update({
+        'width': 240, 'height': 160, 'centerx': 120, 'centery': 80,
+        'renderer': renderer})
+    background = dict(BACKGROUND)
+    background.update({
+        'shape.width': 240.0, 'shape.height': 160.0,
+        'bgcolor.normal': '#224466', 'bgcolor.transparency': 100})
+    button = dict(SQUARE_BUTTON)
+    button.update({'shape.left': 20.0, 'shape.top': 20.0})
+    ellipse = dict(SQUARE_BUTTON)
+    ellipse.update({
+        'shape': 'round', 'shape.left': 150.0, 'shape.top': 60.0,
+        'shape.width': 60.0, 'shape.height': 60.0, 'bgcolor.normal': '#CC3322'})
+    text = dict(TEXT)
+    text.update({'shape.left': 20.0, 'shape.top': 100.0})
+    data['shapes'] = [background, button, ellipse, text]
+    return data
+
+
+def render_raster_reader(reader):
+    image = QtGui.QImage(
+        reader.size(), QtGui.QImage.Format_ARGB32_Premultiplied)
+    image.fill(QtCore.Qt.transparent)
+    reader.render(image)
+    return image
+
+
+def count_different_pixels(image1, image2):
+    count = 0
+    for y in range(image1.height()):
+        for x in range(image1.width()):
+            color1 = QtGui.QColor.fromRgba(image1.pixel(x, y))
+            color2 = QtGui.QColor.fromRgba(image2.pixel(x, y))
+            channels = zip(color1.getRgb(), color2.getRgb())
+            if any(abs(c1 - c2) > TOLERANCE for c1, c2 in channels):
+                count += 1
+    return count
+
+
+def test_opengl_reader_matches_raster_reader():
+    application = get_application()
+    if not is_opengl_available():
+        pytest.skip('OpenGL is unavailable')
+    raster_reader = HotboxReader(create_hotbox_data(RASTER))
+    opengl_reader = HotboxReader(create_hotbox_data(OPENGL))
+    assert raster_reader.canvas is None
+    assert opengl_reader.canvas is not None
+    opengl_reader.show()
+    application.processEvents()
+    try:
+        expected = render_raster_reader(raster_reader)
+        image = opengl_reader.canvas.grabFramebuffer()
+    finally:
+        opengl_reader.hide()
+    image = image.convertToFormat(expected.format())
+    assert image.size() == expected.size()
+    different = count_different_pixels(image, expected)
+    pixels = expected.width() * expected.height()
+    assert different <= pixels * MAX_DIFFERENT_PIXELS_RATIO
@@ -0,0 +1,26 @@
+# coding=utf-8
+import json
+from hotbox_designer.data import get_new_hotbox, load_hotboxes_datas
+from hotbox_designer.schema import SCHEMA_VERSION
+from hotbox_designer.templates import HOTBOX, SQUARE_BUTTON, TEXT
+
+
+def test_up_to_date_file_missing_options_are_filled(tmpdir):
+    filename = str(tmpdir.join('hotboxes.json'))
+    data = get_new_hotbox([])
+    data['shapes'].extend([SQUARE_BUTTON.copy(), TEXT.copy()])
+    data['schema_version'] = SCHEMA_VERSION
+    # options removed by hand from a file saved with the current schema
+    del data['general']['aiming']
+    del data['shapes'][0]['action.left.mode']
+    del data['shapes'][1]['text.size']
+    with open(filename, 'w') as f:
+        json.dump([data], f)
+
+    data = load_hotboxes_datas(filename)[0]
+    assert 'schema_version' not in data
+    assert data['general']['aiming'] == HOTBOX['aiming']
+    assert data['shapes'][0]['action.left.mode'] == (
+        SQUARE_BUTTON['action.left.mode'])
+    # the text shapes defaults differ from the buttons ones
+    assert data['shapes'][1]['text.size'] == TEXT['text.size']
@@ -0,0 +1,20 @@
+# coding=utf-8
+import time
+from hotbox_designer import telemetry
+from hotbox_designer.languages import execute_logged
+
+
+def test_logged_execution_is_recorded():
+    records = telemetry.enable().records
+    try:
+        execute_logged(
+            lambda code: time.sleep(0.05), None, 'python', 'thread',
+            hotbox='hotbox', label='slow')
+    finally:
+        telemetry.disable()
+    assert len(records) == 1
+    record = records[0]
+    assert record['event'] == telemetry.EXECUTE
+    assert record['duration'] >= 50
+    assert (record['hotbox'], record['shape'], record['language']) == (
+        'hotbox', 'slow', 'python')